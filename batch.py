@@ -0,0 +1,9 @@
+import multiprocessing
+import sys
+
+from src.function.batch import main
+
+if __name__ == "__main__":
+    # 打包为可执行文件后，进程池子进程需要此调用
+    multiprocessing.freeze_support()
+    sys.exit(main())
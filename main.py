@@ -1,10 +1,11 @@
 import sys
 import os
 import traceback
+import multiprocessing
+from PyQt6.QtCore import Qt
 from PyQt6.QtWidgets import QApplication, QMessageBox
 from src.auth.auth import AuthManager
 from src.widgets.register_dialog import RegisterDialog
-from src.widgets.main_window import MainWindow  # 从主窗口模块导入你的窗口
 from src.function.logger import log_operation, log_error, performance_monitor
 
 
@@ -18,6 +19,8 @@ def main():
     try:
         log_operation("正在初始化应用程序...", "INFO")
         print("正在初始化应用程序...")
+        # 允许在创建 QApplication 之后再按需加载 QtWebEngine
+        QApplication.setAttribute(Qt.ApplicationAttribute.AA_ShareOpenGLContexts)
         app = QApplication(sys.argv)
         
         # 检查程序是否可以正常创建文件
@@ -56,6 +59,8 @@ def main():
         
         log_operation("已注册，启动主程序...", "INFO")
         print("已注册，启动主程序...")
+        # 注册检查通过后再导入主窗口；pandas、openpyxl 在首次导入/导出数据时才加载
+        from src.widgets.main_window import MainWindow
         main_window = MainWindow()
         main_window.show() 
         sys.exit(app.exec())
@@ -75,4 +80,6 @@ def main():
         return 1
 
 if __name__ == "__main__":
+    # 打包为可执行文件后，进程池子进程需要此调用
+    multiprocessing.freeze_support()
     main()
@@ -1,105 +1,271 @@
 import os
-from collections import defaultdict
+import re
+from functools import lru_cache
+from itertools import groupby
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-import pandas as pd
+from src.data.observation_store import ObservationStore
+from src.function.logger import log_error
+
+# 手簿尾部结果块的行数
+RESULT_BLOCK_ROWS = 6
+# pandas 读取 Excel 时默认视为缺失值的文本
+NA_TEXTS = {
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+}
+
+# 纯 ASCII 点名的前两组字符：数字、字母、符号各自成组
+ASCII_ID_PATTERN = re.compile(r'([0-9]+|[A-Za-z]+|[^0-9A-Za-z]+)([0-9]+|[A-Za-z]+|[^0-9A-Za-z]+)?')
+
+
+def _char_type(c):
+    """判断字符类型：数字、字母或符号"""
+    if c.isdigit():
+        return 'digit'
+    elif c.isalpha():
+        return 'alpha'
+    else:
+        return 'symbol'
+
+
+@lru_cache(maxsize=None)
+def parse_point_id(s):
+    """
+    识别并提取字符串中的特定模式（通常是测站或目标点标识）
+
+    将字符串按数字、字母和符号分组，返回前两组字符，例如：
+    - "A123-XYZ" 会被识别为 "A123"
+    - "T45(南)" 会被识别为 "T45"
+    - "KZ03SS-0519" 会被识别为 "KZ03"
+
+    纯 ASCII 字符串使用预编译正则匹配，其余字符串按 Unicode 字符类型逐组切分；
+    结果按输入字符串缓存，同名点只解析一次
+    """
+    if not s:
+        return ""
+    if s.isascii():
+        return ASCII_ID_PATTERN.match(s).group(0)
+    groups = [''.join(chars) for _, chars in groupby(s, key=_char_type)]
+    return ''.join(groups[:2])
+
+
+def _read_xls_tail(file_path, n_rows):
+    """用 xlrd 读取 .xls 的表头和尾部 n_rows 行，遇到无法等价转换的单元格返回 None"""
+    import xlrd
+
+    book = xlrd.open_workbook(file_path, on_demand=True)
+    try:
+        sheet = book.sheet_by_index(0)
+        if sheet.nrows < 2:
+            return None
+        rows = []
+        for row_idx in [0] + list(range(max(1, sheet.nrows - n_rows), sheet.nrows)):
+            row = [float('nan')] * sheet.ncols
+            for col_idx, cell in enumerate(sheet.row(row_idx)):
+                if cell.ctype in (xlrd.XL_CELL_EMPTY, xlrd.XL_CELL_BLANK):
+                    continue
+                if cell.ctype == xlrd.XL_CELL_NUMBER:
+                    value = cell.value
+                    row[col_idx] = int(value) if value.is_integer() else value
+                elif cell.ctype == xlrd.XL_CELL_TEXT:
+                    if cell.value not in NA_TEXTS:
+                        row[col_idx] = cell.value
+                else:
+                    # 日期、布尔、错误值等交给 pandas 处理
+                    return None
+            rows.append(row)
+        return rows
+    finally:
+        book.release_resources()
+
+
+def read_result_block(file_path):
+    """
+    只读取手簿尾部的结果块，不再把整张表加载为 DataFrame
+
+    使用 xlrd 按需读取 .xls；表格版式不符合预期时退回 pd.read_excel 整表读取
+    """
+    import pandas as pd
+
+    try:
+        rows = _read_xls_tail(file_path, RESULT_BLOCK_ROWS)
+    except Exception:
+        rows = None
+    # 表头为空或最后一行为空时，尾部位置可能与 pandas 的结果不一致
+    if not rows or all(pd.isna(value) for value in rows[0]) or all(pd.isna(value) for value in rows[-1]):
+        return MeasurementData.extract_result_block(pd.read_excel(file_path))
+    return MeasurementData.extract_result_block(pd.DataFrame(rows[1:]))
+
+
+def parse_field_book(file_path):
+    """
+    解析单个外业手簿，返回 (文件标识符, 结果块, 观测行)
+
+    定义在模块级别，便于在进程池中调用
+    """
+    # 获取文件所在的上一级目录名称作为附加信息
+    last_dir = os.path.basename(os.path.dirname(os.path.dirname(file_path)))
+    # 获取文件名(去掉.xls)作为基础文件名
+    file_name = os.path.basename(file_path)[:-4]
+    # 组合文件名和目录名，形成标识符
+    name = file_name + '-' + last_dir
+    # 只读取尾部的结果块
+    block = read_result_block(file_path)
+    return name, block, MeasurementData.data_transform(name, block)
 
 
 class MeasurementData:
-    def __init__(self, path):
+    def __init__(self, path, workers=None, cache=None, progress=None, is_cancelled=None):
+        """
+        path: 外业手簿所在目录
+        workers: 并行解析的进程数，为空或 1 时按单进程顺序解析
+        cache: IngestCache 实例，为空时不使用缓存
+        progress: 进度回调 progress(已解析文件数, 文件总数, 新增的观测行)，新增的观测行按文件顺序给出
+        is_cancelled: 返回是否取消的函数，每解析完一个文件检查一次；取消后只保留已按顺序合并的文件
+        """
         self.original_list = []
-        self.original_data = []
-        self.temp_files = []
+        self.observations = ObservationStore()  # 列式存储的观测数据
         self.path = path
-        self.grouped_data = defaultdict(list)  # 使用 defaultdict(list) 以便直接添加数据
+        self.workers = workers
+        self.cache = cache
+        self.progress = progress
+        self.is_cancelled = is_cancelled
+        self.cancelled = False  # 是否在解析完全部文件之前被取消
+        self.grouped_data = None
         self.process_directory()
-        self.data_transform()
-        self.cleanup_temp_files()
         self.get_grouped_data()
 
-    def process_directory(self):
-        for root, dirs, files in os.walk(self.path):
-            for file in files:
-                if file.endswith('.xls'):
-                    file_path = os.path.join(root, file)
-                    data = pd.read_excel(file_path)
-                    temp_file_path = file_path.replace(".xls", "_temp.xlsx")
-                    data.to_excel(temp_file_path, index=False)
-                    self.temp_files.append(temp_file_path)
+    @property
+    def original_data(self):
+        """按行返回全部观测数据"""
+        return list(self.observations)
 
+    def list_field_books(self):
+        """按目录名、文件名排序列出所有外业手簿(.xls，扩展名不区分大小写)，保证解析顺序稳定"""
+        file_paths = []
         for root, dirs, files in os.walk(self.path):
-            for file in files:
-                if file.endswith('_temp.xlsx'):
-                    file_path = os.path.join(root, file)
-                    # 获取文件所在的上一级目录名称作为附加信息
-                    last_dir = os.path.basename(os.path.dirname(os.path.dirname(file_path)))
-                    # 获取文件名(去掉_temp.xlsx)作为基础文件名
-                    file_name = file[:-10]
-                    # 读取Excel文件数据
-                    data = pd.read_excel(file_path)
-                    # 组合文件名和目录名，形成标识符
-                    name = file_name + '-' + last_dir
-                    # 选择尾部6行数据，并且只取有效列（从第2列开始，排除最后4列）
-                    # 这里通常包含测量结果数据
-                    selected_rows = data.tail(6).iloc[:, 1:-4]
-                    # 获取第一列的列名（通常包含目标点信息）
-                    column_name = selected_rows.columns[0]
-                    # 移除第一列为空的行（确保有目标点信息）
-                    selected_rows = selected_rows.dropna(subset=[column_name])
-                    # 转换为DataFrame，只保留值（不保留原始列名）
-                    df = pd.DataFrame(selected_rows.values)
-                    # 重置列名为空（后续处理中会提取实际有意义的信息）
-                    df.columns = [''] * len(df.columns)
-                    # 将处理后的数据与文件标识符一起保存
-                    self.original_list.append((name, df))
-
-    def cleanup_temp_files(self):
-        for temp_file in self.temp_files:
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
-
-    def group_by_type(self, s):
+            dirs.sort()
+            for file in sorted(files):
+                if file.lower().endswith('.xls'):
+                    file_paths.append(os.path.join(root, file))
+        return file_paths
+
+    def process_directory(self):
+        """
+        遍历目录，逐个解析外业手簿(.xls)
+
+        每个文件只在内存中读取一次，不再生成 _temp.xlsx 中间文件；
+        启用缓存时只解析新增或修改过的文件；
+        指定 workers 时由进程池并行解析，结果仍按文件顺序合并；
+        每解析完一个文件报告一次进度，并给出按文件顺序新合并的观测行，便于边解析边显示
+        """
+        import pandas as pd
+
+        file_paths = self.list_field_books()
+        results = [None] * len(file_paths)
+        if self.cache is not None:
+            for idx, file_path in enumerate(file_paths):
+                cached = self.cache.get(file_path)
+                if cached is not None:
+                    name, block, rows = cached
+                    block = pd.DataFrame(block)
+                    block.columns = [''] * len(block.columns)
+                    results[idx] = (name, block, rows)
+        pending = [idx for idx, result in enumerate(results) if result is None]
+
+        original_rows = []
+        merged = 0  # 已按文件顺序合并的文件数
+
+        def merge(done):
+            """合并已解析的连续前缀文件，并报告进度和新合并的观测行"""
+            nonlocal merged
+            start = len(original_rows)
+            while merged < len(results) and results[merged] is not None:
+                name, block, rows = results[merged]
+                self.original_list.append((name, block))
+                original_rows.extend(rows)
+                merged += 1
+            if self.progress is not None:
+                self.progress(done, len(results), original_rows[start:])
+
+        done = len(results) - len(pending)
+        merge(done)
+        parsed = self.parse_files([file_paths[idx] for idx in pending])
+        try:
+            for idx, result in zip(pending, parsed):
+                results[idx] = result
+                if self.cache is not None:
+                    name, block, rows = result
+                    self.cache.put(file_paths[idx], name, block.values.tolist(), rows)
+                done += 1
+                merge(done)
+                if self.is_cancelled is not None and self.is_cancelled() and done < len(results):
+                    self.cancelled = True
+                    break
+        finally:
+            parsed.close()  # 取消时停止尚未开始的解析
+        if self.cache is not None:
+            self.cache.save()
+        self.observations = ObservationStore.from_rows(original_rows)
+
+    def parse_files(self, file_paths):
+        """
+        解析一组手簿，按输入顺序逐个产出解析结果（生成器）
+        提前关闭生成器时取消进程池中尚未开始的解析
+        """
+        done = 0
+        if self.workers and self.workers > 1 and len(file_paths) > 1:
+            executor = None
+            try:
+                executor = ProcessPoolExecutor(max_workers=self.workers)
+                chunksize = max(1, len(file_paths) // (self.workers * 4))
+                for result in executor.map(parse_field_book, file_paths, chunksize=chunksize):
+                    yield result
+                    done += 1
+            except (OSError, BrokenProcessPool) as e:
+                # 进程池不可用时，剩余的文件退回单进程解析
+                log_error(e, "并行解析外业手簿失败，改为单进程解析")
+            finally:
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+        for file_path in file_paths[done:]:
+            yield parse_field_book(file_path)
+
+    @staticmethod
+    def extract_result_block(data):
+        """
+        从手簿数据中提取尾部的测量结果块
+        """
+        import pandas as pd
+
+        # 选择尾部6行数据，并且只取有效列（从第2列开始，排除最后4列）
+        # 这里通常包含测量结果数据
+        selected_rows = data.tail(6).iloc[:, 1:-4]
+        # 获取第一列的列名（通常包含目标点信息）
+        column_name = selected_rows.columns[0]
+        # 移除第一列为空的行（确保有目标点信息）
+        selected_rows = selected_rows.dropna(subset=[column_name])
+        # 转换为DataFrame，只保留值（不保留原始列名）
+        df = pd.DataFrame(selected_rows.values)
+        # 重置列名为空（后续处理中会提取实际有意义的信息）
+        df.columns = [''] * len(df.columns)
+        return df
+
+    @staticmethod
+    def group_by_type(s):
         """
         识别并提取字符串中的特定模式（通常是测站或目标点标识）
-        
-        工作原理：
-        1. 将字符串分组为数字、字母和符号
-        2. 返回前两组字符（通常是站点编号的主要部分）
-        
-        例如：
-        - "A123-XYZ" 会被识别为 "A123"
-        - "T45(南)" 会被识别为 "T45"
+
+        例如："T45(南)" 会被识别为 "T45"，实现见 parse_point_id
         """
-        if not s:
-            return ""
-
-        groups = []
-        current_group = s[0]
-
-        def char_type(c):
-            """判断字符类型：数字、字母或符号"""
-            if c.isdigit():
-                return 'digit'
-            elif c.isalpha():
-                return 'alpha'
-            else:
-                return 'symbol'
-
-        # 按字符类型分组
-        for i in range(1, len(s)):
-            if char_type(s[i]) == char_type(current_group[-1]):
-                current_group += s[i]
-            else:
-                groups.append(current_group)
-                current_group = s[i]
-
-        groups.append(current_group)
-        # 返回前两组字符（通常是字母+数字或数字+字母的组合）
-        # 例如："T45(南)" 会返回 "T45"
-        return groups[0] + groups[1] if len(groups) > 1 else groups[0]
-
-    def data_transform(self):
+        return parse_point_id(s)
+
+    @staticmethod
+    def data_transform(key, value):
         """
-        将原始数据转换为结构化格式
+        将单个文件的结果块转换为结构化格式
         
         每行数据包含：
         - 文件标识符
@@ -109,20 +275,16 @@ class MeasurementData:
         - 天顶角均值（数据第6列）
         - 斜距（数据第7列）
         """
-        # 数据转换
-        for key, value in self.original_list:
-            # 从文件标识符中提取测站ID
-            station = self.group_by_type(key)
-            for i in range(value.shape[0]):
-                self.original_data.append([
-                    key,  # 文件标识符
-                    station,  # 测站ID
-                    self.group_by_type(value.iloc[i, 0]),  # 目标ID（从第一列提取）
-                    float(value.iloc[i, 4]),  # 归零方向均值（第5列）
-                    float(value.iloc[i, 5]),  # 天顶角均值（第6列）
-                    float(value.iloc[i, 6]),  # 斜距（第7列）
-                ])
-
+        if value.shape[0] == 0:
+            return []
+        # 从文件标识符中提取测站ID
+        station = parse_point_id(key)
+        array = value.to_numpy()
+        # 目标ID（从第一列提取）
+        targets = [parse_point_id(str(target)) for target in array[:, 0]]
+        # 归零方向均值、天顶角均值、斜距（第5~7列）整块转换为浮点数
+        values = array[:, 4:7].astype(float).tolist()
+        return [[key, station, target, hz, z, s] for target, (hz, z, s) in zip(targets, values)]
 
     def get_grouped_data(self):
         """
@@ -131,10 +293,8 @@ class MeasurementData:
         分组键为(测站ID, 目标ID)的元组
         这样可以将同一测站对同一目标的多次测量分到一组
         """
-        # 根据测站ID和目标ID分组，返回分组后的数据
-        for value in self.original_data:
-            group_key = (value[1], value[2])  # 使用(测站ID, 目标ID)作为分组键
-            self.grouped_data[group_key].append(value)
+        # 根据测站ID和目标ID分组，每组只保存观测行号
+        self.grouped_data = self.observations.grouped()
 
 
 if __name__ == '__main__':
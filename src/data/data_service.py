@@ -1,124 +1,353 @@
-import openpyxl
-from openpyxl.workbook import Workbook
-from collections import defaultdict
+import numpy as np
+
+from src.data.observation_store import ObservationStore, GroupedObservations, RESULT_COLUMNS
 from src.function.measurement import Measurement
 
+# 导出时计算结果的显示格式（单元格中保存完整精度的数值）
+RESULT_NUMBER_FORMAT = '0.00000'
+# 导入匹配表时每读取这么多行报告一次进度、检查一次是否取消
+PROGRESS_ROWS = 5000
+
 class DataService:
     def __init__(self):
         """
         初始化 DataService 实例。
-        data: 存储导入的原始数据（列表）。
-        grouped_data: 存储分组后的数据（字典，键为分组元组，值为数据列表）。
+        data: 存储导入的原始数据（ObservationStore）。
+        grouped_data: 存储分组后的数据（GroupedObservations，键为分组元组，值为该组的观测视图）。
         """
-        self.data = []
-        self.grouped_data = defaultdict(list)
+        self.data = ObservationStore()
+        self.grouped_data = GroupedObservations(self.data, {})
 
-    def import_excel(self, file_path):
+    def import_excel(self, file_path, progress=None, is_cancelled=None):
         """
         从指定的 Excel 文件导入数据。
         参数：
             file_path (str): Excel 文件的路径。
+            progress (callable): 进度回调 progress(已读取行数, 总行数, None)，每 PROGRESS_ROWS 行调用一次。
+            is_cancelled (callable): 返回是否取消，取消时只保留已读取的行。
         返回：
-            list: 读取的每一行数据组成的列表，每行是一个元组。
+            ObservationStore: 按列存储的观测数据，迭代时每行是一个元组。
         """
-        wb = openpyxl.load_workbook(file_path)
+        import openpyxl  # 首次导入时再加载 openpyxl，加快程序启动
+
+        wb = openpyxl.load_workbook(file_path, read_only=True)
         ws = wb.active
-        self.data = [row for row in ws.iter_rows(min_row=2, values_only=True)]
+        rows = ws.iter_rows(min_row=2, values_only=True)
+        if progress is not None or is_cancelled is not None:
+            rows = _report_rows(rows, max((ws.max_row or 1) - 1, 0), progress, is_cancelled)
+        self.data = ObservationStore.from_rows(rows)
+        wb.close()
         return self.data
 
     def export_excel(self, data, file_path, calculated=False):
         """
-        将数据导出为 Excel 文件。
+        将数据导出为 Excel 文件，数值按数字写入，计算结果列只设置显示格式，不舍入。
         参数：
-            data (list): 要导出的数据，每行为一个元组或列表。
+            data (iterable): 要导出的数据，每行为一个元组或列表，缺失值为 None。
             file_path (str): 保存的 Excel 文件路径。
             calculated (bool): 是否导出包含计算结果的表头。
         返回：
             None
         """
-        wb = Workbook()
-        ws = wb.active
+        import openpyxl  # 首次导出时再加载 openpyxl，加快程序启动
+        from openpyxl.cell import WriteOnlyCell
+
+        # 只写模式：逐行写入文件，不在内存中保留整张工作表
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        # 设置列宽（只写模式下须在写入数据之前设置）
+        column_widths = {'A': 20, 'B': 10, 'C': 10, 'D': 16, 'E': 20, 'F': 20, 'G': 12, 'H': 12, 'I': 12, 'J': 12, 'K': 12, 'L': 12, 'M': 12, 'N': 12, 'O': 12, 'P': 12}
+        for col, width in column_widths.items():
+            ws.column_dimensions[col].width = width
+        center = openpyxl.styles.Alignment(horizontal='center', vertical='center')
+        # 每列一个居中的单元格，逐行只更换数值后写入，避免为每个单元格重新设置样式
+        cells = []
+
+        def append(values):
+            while len(cells) < len(values):
+                cell = WriteOnlyCell(ws)
+                cell.alignment = center
+                cells.append(cell)
+            for cell, value in zip(cells, values):
+                cell.value = value
+            ws.append(cells[:len(values)])
+
         # 根据是否已计算，写入不同的表头
         if calculated:
-            ws.append([
+            append([
                 "文件名", "测站", "目标", "归零方向均值", "天顶角均值", "斜距(m)", "仪器高(m)", "目标高(m)",
                 "测站温度(℃)", "目标温度(℃)", "测站气压(hPa)", "目标气压(hPa)", "气象改正(m)", "加乘常数改正(m)",
                 "平距(m)", "高差(m)", "高差中数(m)", "往返不符值(mm)", "限差(mm)"
             ])
+            # 计算结果列（M ~ S）显示 5 位小数
+            for cell in cells[12:19]:
+                cell.number_format = RESULT_NUMBER_FORMAT
         else:
-            ws.append([
+            append([
                 "文件名", "测站", "目标", "归零方向均值", "天顶角均值", "斜距", "仪器高(m)", "目标高(m)", "测站温度",
                 "目标温度", "测站气压", "目标气压"
             ])
         # 写入数据内容
         for row in data:
-            clean_row = [cell if cell is not None else '' for cell in row]
-            ws.append(clean_row)
-        # 设置单元格居中
-        for row in ws.iter_rows(min_row=1):
-            for cell in row:
-                cell.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center')
-        # 设置列宽
-        column_widths = {'A': 20, 'B': 10, 'C': 10, 'D': 16, 'E': 20, 'F': 20, 'G': 12, 'H': 12, 'I': 12, 'J': 12, 'K': 12, 'L': 12, 'M': 12, 'N': 12, 'O': 12, 'P': 12}
-        for col, width in column_widths.items():
-            ws.column_dimensions[col].width = width
+            append(row)
         wb.save(file_path)
 
     def group_data(self, data):
         """
         对原始数据按测站和目标进行分组。
         参数：
-            data (list): 原始数据列表，每行为一个元组。
+            data (ObservationStore | list): 原始数据，列表时每行为一个元组。
         返回：
-            dict: 分组后的数据，键为 (测站, 目标) 的元组，值为该组的数据列表。
+            GroupedObservations: 分组后的数据，键为 (测站, 目标) 的元组，值为该组观测的行号视图。
         """
-        grouped_data = defaultdict(list)
-        for value in data:
-            group_key = (value[1], value[2])  # 以测站和目标为分组依据
-            grouped_data[group_key].append(value)
+        if not isinstance(data, ObservationStore):
+            data = ObservationStore.from_rows(data)
+        return data.grouped()
+
+    def match_and_calculate(self, data, workers=None, progress=None, is_cancelled=None):
+        """
+        分组、配对排序并计算（可在后台线程中运行）。
+        参数：
+            data (ObservationStore): 原始数据。
+            workers (int): 进程数，见 sort_and_calculate。
+            progress (callable): 进度回调 progress(已完成步骤数, 总步骤数, None)。
+            is_cancelled (callable): 返回是否取消，在分组之后检查。
+        返回：
+            GroupedObservations: 排序并计算后的分组数据，取消时为 None。
+        """
+        if progress is not None:
+            progress(0, 2, None)
+        grouped_data = self.group_data(data)
+        if is_cancelled is not None and is_cancelled():
+            return None
+        if progress is not None:
+            progress(1, 2, None)
+        grouped_data = self.sort_and_calculate(grouped_data, workers=workers)
+        if progress is not None:
+            progress(2, 2, None)
         return grouped_data
 
-    def sort_and_calculate(self, grouped_data):
+    def sort_and_calculate(self, grouped_data, workers=None):
         """
         对分组后的数据进行配对排序，并对每组数据进行测量计算。
         参数：
-            grouped_data (dict): 分组后的数据，键为 (测站, 目标)，值为数据列表。
+            grouped_data (GroupedObservations): 分组后的数据，键为 (测站, 目标)。
+            workers (int): 进程数，大于 1 且观测数较多时按测站分片多进程计算，结果与单进程相同。
         返回：
-            dict: 排序并计算后的分组数据，结构同输入。
+            GroupedObservations: 排序后的分组数据，计算结果写入共享的 ObservationStore，
+            每行数据末尾追加计算结果。
         主要逻辑：
-            - 先将有互为 (a, b) 和 (b, a) 的分组配对排序。
-            - 对每组数据调用 Measurement.calculate_all 进行测量计算，
-              并将结果追加到原始数据后面。
-        """
-        paired_data = []  # 存储有对应 (b, a) 键的键对
-        unpaired_data = []  # 存储没有对应 (b, a) 键的键
-        visited = set()  # 标记已处理的键
-        # 遍历所有分组
-        for key in grouped_data.keys():
-            if key not in visited:
-                reverse_key = (key[1], key[0])  # 生成 (b, a) 键
-                if reverse_key in grouped_data:
-                    paired_data.append((key, grouped_data[key]))
-                    paired_data.append((reverse_key, grouped_data[reverse_key]))
-                    visited.add(key)
-                    visited.add(reverse_key)
-                else:
-                    unpaired_data.append((key, grouped_data[key]))
-                    visited.add(key)
+            - 按配对索引将互为 (a, b) 和 (b, a) 的分组相邻排列（往测在前），未配对的分组排在最后。
+              排序只影响显示，往返计算按配对索引进行，与行顺序无关。
+            - 调用 Measurement.calculate_all_batch 对全部观测一次性进行测量计算；
+              指定 workers 时由 parallel_compute.compute_sharded 分片后在进程池中计算。
+        """
+        pair_index = grouped_data.pair_index()
+        paired_data = [key for pair in pair_index.pairs() for key in pair]
         # 合并有配对和无配对的数据
-        sorted_data = paired_data + unpaired_data
-        new_grouped_data = {k: v for k, v in sorted_data}
-        # 对每组数据进行测量计算
-        for key, data_list in new_grouped_data.items():
-            updated_data = []
-            for item in data_list:
-                # 调用测量计算逻辑，返回字典
-                results = Measurement.calculate_all(
-                    s=float(item[5]), z=float(item[4]), i=float(item[6]), l=float(item[7]),
-                    t_a=float(item[8]), t_b=float(item[9]), p_a=float(item[10]), p_b=float(item[11])
-                )
-                additional_values = tuple(results.values())  # 取所有计算结果
-                updated_item = item + additional_values  # 拼接到原始数据后
-                updated_data.append(updated_item)
-            new_grouped_data[key] = updated_data
-        return new_grouped_data
\ No newline at end of file
+        new_grouped_data = grouped_data.reorder(paired_data + pair_index.unpaired)
+        from src.function.parallel_compute import MIN_PARALLEL_OBSERVATIONS, compute_sharded
+
+        if workers and workers > 1 and len(new_grouped_data.store) >= MIN_PARALLEL_OBSERVATIONS:
+            compute_sharded(new_grouped_data, workers)
+        else:
+            self.calculate_results(new_grouped_data)
+        return new_grouped_data
+
+    def calculate_results(self, grouped_data, params=None):
+        """
+        对分组中的全部观测一次性进行测量计算，结果写入共享的 ObservationStore。
+        参数修改后直接调用即可重新计算，分组和行顺序不变。
+        参数：
+            grouped_data (GroupedObservations): 分组后的数据。
+            params (dict): 计算参数，缺省时读取参数设置。
+        返回：
+            dict: 结果列名 -> 按观测行号标记数值是否变化的布尔数组，用于只刷新变化的单元格。
+        """
+        store = grouped_data.store
+        indices = grouped_data.indices()
+        columns = {name: store.column(name)[indices] for name in ("s", "z", "i", "l", "t_a", "t_b", "p_a", "p_b")}
+        if params is not None:
+            columns.update({name: params[name] for name in ("h_a", "h_b", "k", "pc", "mc", "r")})
+        results = Measurement.calculate_all_batch(**columns, z_radians=store.zenith_radians()[indices])
+        # 只在分组的观测上比较新旧结果，再写回按观测行号排列的标记数组
+        changed = {}
+        for name in RESULT_COLUMNS:
+            mask = np.zeros(len(store), dtype=bool)
+            if store.results is None:
+                mask[indices] = True
+            else:
+                old, new = store.results[name][indices], results[name]
+                mask[indices] = (old != new) & ~(np.isnan(old) & np.isnan(new))
+            changed[name] = mask
+        store.set_results(indices, results)
+        return changed
+
+    def calculate_pairs(self, grouped_data, current_indices=None, tolerance_factor=40):
+        """
+        计算往返观测的高差中数、往返不符值和限差，与匹配表的计算方式一致。
+        参数：
+            grouped_data (GroupedObservations): sort_and_calculate 返回的分组数据。
+            current_indices (dict): 分组键 -> 当前选中的观测序号，缺省时取每组第一条。
+            tolerance_factor (float): 限差系数。
+        返回：
+            list: 每个分组一行，为当前选中的观测数据，顺序与分组顺序一致；
+                  每对往返观测的结果追加在往测行末尾（高差中数、往返不符值、限差），与行顺序无关。
+        """
+        current_indices = current_indices or {}
+        store, groups = grouped_data.store, grouped_data.groups
+        positions = {key: position for position, key in enumerate(groups)}
+        observations = np.array([groups[key][current_indices.get(key, 0)] for key in groups], dtype=np.intp)
+        rows = [list(row) for row in store.rows(observations)]
+        pairs = grouped_data.pair_index().pairs()
+        first_rows = [positions[forward] for forward, _ in pairs]
+        second_rows = [positions[backward] for _, backward in pairs]
+        # 缺失的计算结果按 0 处理，与逐对调用 Measurement.calculate_pair 的结果一致
+        first, second = observations[first_rows], observations[second_rows]
+        heights, distances = np.nan_to_num(store.results["height"]), np.nan_to_num(store.results["d"])
+        pair = Measurement.calculate_pair_batch(heights[first], heights[second], distances[first], distances[second],
+                                                tolerance_factor)
+        for row, values in zip(first_rows, zip(pair["average_d"], pair["sum_value"], pair["tolerance"])):
+            rows[row].extend(values)
+        return rows
+
+    def reciprocal_height_differences(self, grouped_data, current_indices=None):
+        """
+        取往返观测的高差中数和平均平距，作为高程网平差的观测值。
+        参数：
+            grouped_data (GroupedObservations): 分组数据。
+            current_indices (dict): 分组键 -> 当前选中的观测序号，缺省时取每组第一条。
+        返回：
+            list: 每对往返观测一项 (起点, 终点, 高差中数(m), 平距(m))，起点、终点为往测的测站和目标，
+                  高差中数与匹配表一致；未配对的分组不参与。
+        """
+        current_indices = current_indices or {}
+        store, groups = grouped_data.store, grouped_data.groups
+        pairs = grouped_data.pair_index().pairs()
+        first = np.array([groups[key][current_indices.get(key, 0)] for key, _ in pairs], dtype=np.intp)
+        second = np.array([groups[key][current_indices.get(key, 0)] for _, key in pairs], dtype=np.intp)
+        # 缺失的计算结果按 0 处理
+        heights = np.nan_to_num(store.results["height"])
+        distances = np.abs(np.nan_to_num(store.results["d"]))
+        pair = Measurement.calculate_pair_batch(heights[first], heights[second], distances[first], distances[second])
+        average_distances = (0.5 * (distances[first] + distances[second])).tolist()
+        return [(key[0], key[1], average_d, distance)
+                for (key, _), average_d, distance in zip(pairs, pair["average_d"], average_distances)]
+
+    def read_fixed_heights(self, file_path):
+        """
+        读取已知点高程。
+        参数：
+            file_path (str): Excel 文件（前两列为点名、高程）或文本文件（每行“点名,高程”，逗号、空格或制表符分隔）。
+        返回：
+            dict: 点名 -> 高程(m)，表头等无法解析高程的行会被跳过。
+        """
+        if file_path.lower().endswith(('.xlsx', '.xlsm')):
+            import openpyxl  # 首次使用时再加载 openpyxl，加快程序启动
+
+            wb = openpyxl.load_workbook(file_path, read_only=True)
+            rows = [row[:2] for row in wb.active.iter_rows(values_only=True) if row and len(row) >= 2]
+            wb.close()
+        else:
+            with open(file_path, 'r', encoding='utf-8-sig') as f:
+                rows = [line.replace(',', ' ').replace('，', ' ').split()[:2] for line in f if line.strip()]
+        fixed_heights = {}
+        for row in rows:
+            if len(row) < 2 or row[0] is None:
+                continue
+            try:
+                fixed_heights[str(row[0]).strip()] = float(row[1])
+            except (TypeError, ValueError):
+                continue
+        return fixed_heights
+
+    def export_adjustment(self, observations, result, fixed_heights, file_path):
+        """
+        导出高程网平差结果。
+        参数：
+            observations (list): 平差使用的观测值，见 reciprocal_height_differences。
+            result (dict): adjust_height_network 的返回值。
+            fixed_heights (dict): 已知点高程。
+            file_path (str): 保存的 Excel 文件路径。
+        """
+        import openpyxl  # 首次导出时再加载 openpyxl，加快程序启动
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "平差高程"
+        ws.append(["点名", "高程(m)", "高程中误差(mm)", "已知点"])
+        precisions = result["precisions"]
+        for name, height in sorted(result["heights"].items()):
+            known = name in fixed_heights
+            precision = 0.0 if known else precisions.get(name)
+            ws.append([name, height, precision if precision is not None else '', "是" if known else ""])
+        _set_number_formats(ws, {'B': '0.00000', 'C': '0.00'})
+
+        ws = wb.create_sheet("高差改正数")
+        ws.append(["起点", "终点", "高差中数(m)", "平距(m)", "改正数(mm)", "平差后高差(m)"])
+        for (start, end, height_difference, distance), residual, adjusted in zip(
+                observations, result["residuals"], result["adjusted"]):
+            ws.append([start, end, height_difference, distance, residual, adjusted])
+        _set_number_formats(ws, {'C': '0.00000', 'D': '0.000', 'E': '0.00', 'F': '0.00000'})
+
+        ws = wb.create_sheet("精度")
+        sigma0 = result["sigma0"]
+        ws.append(["观测数", len(observations)])
+        ws.append(["点数", len(result["heights"])])
+        ws.append(["已知点数", sum(1 for name in result["heights"] if name in fixed_heights)])
+        ws.append(["多余观测数", result["dof"]])
+        ws.append(["单位权中误差(mm/√km)", sigma0 if sigma0 == sigma0 else ''])
+        ws['B5'].number_format = '0.00'
+        for sheet in wb.worksheets:
+            for col in 'ABCDEF':
+                sheet.column_dimensions[col].width = 16
+        wb.save(file_path)
+
+    def export_loop_closures(self, graph, closures, file_path):
+        """
+        导出闭合环闭合差。
+        参数：
+            graph (StationGraph): 测站图。
+            closures (dict): StationGraph.loop_closures 的返回值。
+            file_path (str): 保存的 Excel 文件路径。
+        """
+        import openpyxl  # 首次导出时再加载 openpyxl，加快程序启动
+
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "闭合环"
+        ws.append(["序号", "经过的点", "边数", "环长(m)", "闭合差(mm)", "限差(mm)", "是否超限"])
+        for number, (edge, misclosure, length, tolerance, exceeded) in enumerate(zip(
+                closures["edges"].tolist(), closures["misclosures"].tolist(), closures["lengths"].tolist(),
+                closures["tolerances"].tolist(), closures["exceeded"].tolist()), start=1):
+            points = graph.loop_points(edge)
+            ws.append([number, "-".join(points + points[:1]), len(points), length, misclosure, tolerance,
+                       "超限" if exceeded else ""])
+        _set_number_formats(ws, {'D': '0.000', 'E': '0.00', 'F': '0.00'})
+        for col, width in zip('ABCDEFG', (8, 60, 8, 14, 14, 14, 10)):
+            ws.column_dimensions[col].width = width
+        wb.save(file_path)
+
+
+def _report_rows(rows, total, progress, is_cancelled):
+    """逐行转发 rows，每 PROGRESS_ROWS 行报告一次进度并检查是否取消，取消时提前结束"""
+    for count, row in enumerate(rows, start=1):
+        yield row
+        if count % PROGRESS_ROWS == 0:
+            if progress is not None:
+                # 文件没有记录正确的表格范围时总行数未知，进度条显示忙碌状态
+                progress(count, total if total >= count else 0, None)
+            if is_cancelled is not None and is_cancelled():
+                return
+
+
+def _set_number_formats(ws, formats):
+    """
+    设置数据行（表头之后）各列的数字显示格式，单元格中仍保存完整精度的数值
+    参数：
+        ws: openpyxl 工作表
+        formats (dict): 列字母 -> 数字格式，例如 {'B': '0.00000'}
+    """
+    for col, number_format in formats.items():
+        for cell in ws[col][1:]:
+            cell.number_format = number_format
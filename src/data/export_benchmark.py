@@ -0,0 +1,136 @@
+"""
+计算结果去掉字符串转换后的耗时测试
+
+用法：
+    python -m src.data.export_benchmark [外业手簿匹配表.xlsx] [-n 观测数]
+
+不指定匹配表时生成模拟的测站网观测数据。按原来匹配表格的方式重现去掉的转换并计时：
+计算结果舍入到 5 位小数（calculate_all），每个单元格以 str() 写入（update_table_row），
+往返计算时用 float(单元格文本) 读回高差、平距，结果舍入后再以 str() 写入（calculate_draggable_table_widget），
+导出时取单元格文本（get_all_table_data）；与现在从数据层直接取完整精度数值（DataService.calculate_pairs）比较。
+原方式从已取出的行数据开始计时，不含取数据的时间。
+并输出原方式导出的计算结果与完整精度数值的最大差值，检查差值不超过原方式的舍入误差。
+"""
+import argparse
+import math
+import sys
+import time
+
+from src.data.data_service import DataService
+from src.data.observation_store import ObservationStore, RESULT_COLUMNS
+from src.function.parallel_benchmark import synthetic_rows
+from src.function.parameter_store import DEFAULT_PARAMETERS
+
+PAIR_COLUMNS = ("average_d", "sum_value", "tolerance")
+# 原方式各列的最大舍入误差：计算结果舍入到 5 位小数；高差中数、往返不符值由舍入后的高差再计算并舍入，
+# 往返不符值以 mm 为单位（乘以 1000）
+ROUNDING_ERRORS = {**{name: 0.5e-5 for name in RESULT_COLUMNS}, "average_d": 1e-5, "sum_value": 1e-2,
+                   "tolerance": 1e-5}
+
+
+def best_time(fn, repeats=3):
+    """返回 fn 在 repeats 次调用中最快一次的耗时(s)和该次的返回值"""
+    best, result = math.inf, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def legacy_cells(rows, pair_positions, width, tolerance_factor):
+    """
+    按原来匹配表格的方式生成单元格文本
+    参数：
+        rows (list): 每行当前选中观测的行数据（原始数据 + 完整精度的计算结果）
+        pair_positions (list): 每对往返观测的 (往测行, 返测行)
+        width (int): 原始数据的列数
+        tolerance_factor (float): 限差系数
+    返回：
+        list: 每行的单元格文本，往测行末尾追加高差中数、往返不符值、限差
+    """
+    cells = []
+    for row in rows:
+        values = list(row[:width]) + [None if value is None else round(value, 5) for value in row[width:]]
+        cells.append([str(value) for value in values])
+
+    height, distance = width + RESULT_COLUMNS.index("height"), width + RESULT_COLUMNS.index("d")
+
+    def cell_value(row, col):
+        text = cells[row][col]
+        return float(text) if text != 'None' else 0
+
+    for first, second in pair_positions:
+        first_height, second_height = cell_value(first, height), cell_value(second, height)
+        first_distance, second_distance = cell_value(first, distance), cell_value(second, distance)
+        average_d = round(0.5 * (first_height - second_height), 5)
+        sum_value = round((first_height + second_height) * 1000, 5)
+        tolerance = round(tolerance_factor * math.sqrt(0.5 * (abs(first_distance) + abs(second_distance)) / 1000), 5)
+        cells[first].extend((str(average_d), str(sum_value), str(tolerance)))
+    return cells
+
+
+def compare_rows(old_cells, new_rows, width):
+    """
+    比较原方式导出的单元格文本与完整精度的数值
+    返回：
+        tuple: (行数和往返结果的位置是否一致, 列名 -> 最大差值)
+    """
+    names = RESULT_COLUMNS + PAIR_COLUMNS
+    same = len(old_cells) == len(new_rows)
+    differences = {name: 0.0 for name in names}
+    for old, new in zip(old_cells, new_rows):
+        if len(old) != len(new):
+            same = False
+            continue
+        for name, text, value in zip(names, old[width:], new[width:]):
+            if text == 'None' or value is None:
+                same = same and text == 'None' and value is None
+                continue
+            differences[name] = max(differences[name], abs(float(text) - value))
+    return same, differences
+
+
+def run_benchmark(store):
+    """
+    返回 (原方式耗时(s), 数据层取值耗时(s), 行数, 往返对数, 结果是否一致, 列名 -> 最大差值)
+    """
+    data_service = DataService()
+    params = DEFAULT_PARAMETERS.copy()
+    grouped_data = data_service.sort_and_calculate(data_service.group_data(store))
+    data_service.calculate_results(grouped_data, params)
+    tolerance_factor = params["tolerance_factor"]
+
+    groups = grouped_data.groups
+    positions = {key: position for position, key in enumerate(groups)}
+    pair_positions = [(positions[forward], positions[backward]) for forward, backward in grouped_data.pair_index().pairs()]
+    rows = store.rows([group[0] for group in groups.values()])
+
+    old_time, old_cells = best_time(lambda: legacy_cells(rows, pair_positions, store.width, tolerance_factor))
+    new_time, new_rows = best_time(lambda: data_service.calculate_pairs(grouped_data, None, tolerance_factor))
+    same, differences = compare_rows(old_cells, new_rows, store.width)
+    within = all(differences[name] <= ROUNDING_ERRORS[name] + 1e-9 for name in differences)
+    return old_time, new_time, len(new_rows), len(pair_positions), same and within, differences
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="计算结果去掉字符串转换后的耗时测试")
+    parser.add_argument("input", nargs="?", help="外业手簿匹配表(.xlsx)，不指定时使用模拟数据")
+    parser.add_argument("-n", "--observations", type=int, default=20000, help="模拟数据的观测数")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        store = DataService().import_excel(args.input)
+    else:
+        store = ObservationStore.from_rows(synthetic_rows(args.observations))
+    old_time, new_time, row_count, pair_count, same, differences = run_benchmark(store)
+    print(f"观测数: {len(store)}，匹配表行数: {row_count}，往返对数: {pair_count}")
+    print(f"原方式（舍入、str() 写入单元格、float() 读回、导出单元格文本） {old_time:.3f} s")
+    print(f"从数据层取完整精度数值 {new_time:.3f} s")
+    print("原方式导出与完整精度数值的最大差值：" + "，".join(f"{name} {value:.2g}" for name, value in differences.items()))
+    print(f"{'均在' if same else '超出'}原方式的舍入误差{'内' if same else ''}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
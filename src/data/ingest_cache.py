@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from src.function.logger import log_error
+
+# 缓存格式版本，解析逻辑变化时递增以使旧缓存失效
+CACHE_VERSION = 1
+# 默认缓存容量上限（字节）
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+class IngestCache:
+    """
+    外业手簿解析结果的磁盘缓存
+
+    每个手簿按 路径 + 文件大小 + 修改时间 生成指纹，
+    指纹一致时直接返回缓存的观测行，否则视为失效需要重新解析。
+    缓存总大小超过上限时按最近访问时间(LRU)淘汰。
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        if cache_dir is None:
+            cache_dir = os.path.join(os.path.expanduser("~"), ".tl_tools", "cache")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.index_file = os.path.join(self.cache_dir, "index.json")
+        self.index = self._load_index()
+        self._dirty = False
+
+    def _load_index(self):
+        """加载缓存索引，索引损坏或版本不符时视为空缓存"""
+        if not os.path.exists(self.index_file):
+            return {}
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get("version") != CACHE_VERSION:
+                return {}
+            return index.get("entries", {})
+        except Exception as e:
+            log_error(e, "加载解析缓存索引失败")
+            return {}
+
+    @staticmethod
+    def fingerprint(file_path):
+        """生成文件指纹：(绝对路径, 文件大小, 修改时间)"""
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+    @staticmethod
+    def _entry_key(abs_path):
+        return hashlib.sha1(abs_path.encode('utf-8')).hexdigest()
+
+    def _entry_file(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, file_path):
+        """
+        读取缓存的解析结果
+        返回：
+            tuple: (文件标识符, 结果块数据, 观测行)，未命中或已失效时返回 None
+        """
+        abs_path, size, mtime = self.fingerprint(file_path)
+        key = self._entry_key(abs_path)
+        entry = self.index.get(key)
+        if not entry or entry["size"] != size or entry["mtime"] != mtime:
+            return None
+        try:
+            with open(self._entry_file(key), 'r', encoding='utf-8') as f:
+                payload = json.load(f)
+        except Exception:
+            self._remove(key)
+            return None
+        entry["last_access"] = time.time()
+        self._dirty = True
+        return payload["name"], payload["block"], payload["rows"]
+
+    def put(self, file_path, name, block, rows):
+        """写入单个手簿的解析结果，block 为结果块的二维列表"""
+        abs_path, size, mtime = self.fingerprint(file_path)
+        key = self._entry_key(abs_path)
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            data = json.dumps({"name": name, "block": block, "rows": rows}, ensure_ascii=False)
+            with open(self._entry_file(key), 'w', encoding='utf-8') as f:
+                f.write(data)
+        except Exception as e:
+            log_error(e, f"写入解析缓存失败: {file_path}")
+            return
+        self.index[key] = {
+            "path": abs_path,
+            "size": size,
+            "mtime": mtime,
+            "bytes": len(data.encode('utf-8')),
+            "last_access": time.time(),
+        }
+        self._dirty = True
+
+    def invalidate(self, file_path):
+        """使指定手簿的缓存失效"""
+        self._remove(self._entry_key(os.path.abspath(file_path)))
+
+    def _remove(self, key):
+        self.index.pop(key, None)
+        self._dirty = True
+        entry_file = self._entry_file(key)
+        if os.path.exists(entry_file):
+            os.remove(entry_file)
+
+    def total_bytes(self):
+        return sum(entry["bytes"] for entry in self.index.values())
+
+    def evict(self):
+        """超过容量上限时，按最近访问时间从旧到新淘汰"""
+        total = self.total_bytes()
+        if total <= self.max_bytes:
+            return
+        for key, entry in sorted(self.index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            total -= entry["bytes"]
+            self._remove(key)
+
+    def save(self):
+        """淘汰超额条目并保存索引，使用临时文件保证写入完整"""
+        if not self._dirty:
+            return
+        self.evict()
+        temp_file = self.index_file + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({"version": CACHE_VERSION, "entries": self.index}, f, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
+            self._dirty = False
+        except Exception as e:
+            log_error(e, "保存解析缓存索引失败")
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+
+    def clear(self):
+        """清空全部缓存"""
+        self.index = {}
+        self._dirty = False
+        if os.path.exists(self.cache_dir):
+            shutil.rmtree(self.cache_dir)
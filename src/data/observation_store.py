@@ -0,0 +1,250 @@
+from collections.abc import Mapping, Sequence
+
+import numpy as np
+
+from src.data.pair_index import PairIndex
+from src.function.dms import dms_to_radians
+
+# 文件名、测站、目标之后的原始数值列，顺序与外业手簿表格一致
+NUMERIC_COLUMNS = ("hz", "z", "s", "i", "l", "t_a", "t_b", "p_a", "p_b")
+# 计算结果列，顺序与 Measurement.calculate_all 的返回值一致
+RESULT_COLUMNS = ("mcd", "s_correction", "d", "height")
+# 一行完整原始数据的列数
+FULL_WIDTH = 3 + len(NUMERIC_COLUMNS)
+
+
+def _to_float(value):
+    """将单元格值转换为浮点数，空值和无法解析的值（备注文字、'-' 占位符、日期等）记为 NaN，不中断导入"""
+    if value is None or value == '':
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ObservationStore:
+    """
+    列式存储的观测数据
+
+    文件名、测站、目标以整数编码保存，编码对应的名称存放在 labels 中；
+    数值列和计算结果列均为 float64 数组，缺失值为 NaN。
+    width 为原始数据的列数：目录导入为 6 列，外业手簿为 12 列。
+    """
+
+    def __init__(self, width=FULL_WIDTH):
+        self.width = width
+        self.labels = []
+        self.label_codes = {}
+        self.file_codes = np.empty(0, dtype=np.int32)
+        self.station_codes = np.empty(0, dtype=np.int32)
+        self.target_codes = np.empty(0, dtype=np.int32)
+        self.columns = {name: np.empty(0) for name in NUMERIC_COLUMNS}
+        self.results = None
+        self._zenith_radians = None  # (解码时的天顶角列, 解码结果)，重复计算时共用
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        由行数据构建观测数据
+        参数：
+            rows (iterable): 每行为 [文件名, 测站, 目标, 数值列...] 的列表或元组
+        """
+        rows = [row for row in rows if row and any(value is not None for value in row)]
+        width = min(max((len(row) for row in rows), default=FULL_WIDTH), FULL_WIDTH)
+        store = cls(width)
+        n = len(rows)
+        store.file_codes = np.fromiter((store.encode(row[0]) for row in rows), dtype=np.int32, count=n)
+        store.station_codes = np.fromiter((store.encode(row[1]) for row in rows), dtype=np.int32, count=n)
+        store.target_codes = np.fromiter((store.encode(row[2]) for row in rows), dtype=np.int32, count=n)
+        for col, name in enumerate(NUMERIC_COLUMNS, start=3):
+            store.columns[name] = np.fromiter(
+                (_to_float(row[col]) if col < len(row) else np.nan for row in rows), dtype=np.float64, count=n)
+        return store
+
+    def encode(self, label):
+        """返回名称对应的整数编码，新名称追加到编码表"""
+        code = self.label_codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self.label_codes[label] = code
+            self.labels.append(label)
+        return code
+
+    def append(self, other):
+        """
+        在末尾追加另一份原始观测数据（用于边解析边显示），名称编码按本表重新映射
+        参数：
+            other (ObservationStore): 追加的观测数据，不含计算结果
+        """
+        if not len(other):
+            return
+        if not len(self):
+            self.width = other.width
+        codes = np.array([self.encode(label) for label in other.labels], dtype=np.int32)
+        self.file_codes = np.concatenate((self.file_codes, codes[other.file_codes]))
+        self.station_codes = np.concatenate((self.station_codes, codes[other.station_codes]))
+        self.target_codes = np.concatenate((self.target_codes, codes[other.target_codes]))
+        self.columns = {name: np.concatenate((self.columns[name], other.columns[name])) for name in NUMERIC_COLUMNS}
+        self.results = None
+
+    def __len__(self):
+        return len(self.file_codes)
+
+    def __iter__(self):
+        for idx in range(len(self)):
+            yield self.row(idx)
+
+    def column(self, name):
+        """按列名返回数值列或计算结果列"""
+        if name in self.columns:
+            return self.columns[name]
+        return self.results[name]
+
+    def row(self, idx):
+        """
+        按旧版行格式返回第 idx 条观测
+        返回：
+            tuple: (文件名, 测站, 目标, 数值列..., [计算结果...])，缺失值为 None
+        """
+        labels = self.labels
+        values = [self.columns[name][idx] for name in NUMERIC_COLUMNS[:self.width - 3]]
+        if self.results is not None:
+            values.extend(self.results[name][idx] for name in RESULT_COLUMNS)
+        return (labels[self.file_codes[idx]], labels[self.station_codes[idx]], labels[self.target_codes[idx]],
+                *(None if np.isnan(value) else float(value) for value in values))
+
+    def rows(self, indices):
+        """
+        批量返回多条观测的行数据，按列一次取值，结果与逐条调用 row 相同
+        参数：
+            indices (array_like): 观测行号
+        返回：
+            list: 每条观测一个元组
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        labels = self.labels
+        columns = [[labels[code] for code in codes[indices].tolist()]
+                   for codes in (self.file_codes, self.station_codes, self.target_codes)]
+        arrays = [self.columns[name] for name in NUMERIC_COLUMNS[:self.width - 3]]
+        if self.results is not None:
+            arrays.extend(self.results[name] for name in RESULT_COLUMNS)
+        for array in arrays:
+            columns.append([None if value != value else value for value in array[indices].tolist()])
+        return list(zip(*columns))
+
+    def zenith_radians(self):
+        """
+        返回解码为弧度的天顶角列，首次调用时解码，之后重复计算直接复用
+        缓存按天顶角列数组本身识别：columns["z"] 被替换（追加、读取项目、detach 等）后重新解码，
+        因此修改天顶角时应替换整个数组，不要原地修改
+        """
+        column = self.columns["z"]
+        if self._zenith_radians is None or self._zenith_radians[0] is not column:
+            self._zenith_radians = (column, dms_to_radians(column))
+        return self._zenith_radians[1]
+
+    def key(self, idx):
+        """返回第 idx 条观测的分组键 (测站, 目标)"""
+        return self.labels[self.station_codes[idx]], self.labels[self.target_codes[idx]]
+
+    def detach(self):
+        """将内存映射的数组复制到内存中，释放对项目文件的占用"""
+        def copy(array):
+            return np.array(array) if isinstance(array, np.memmap) else array
+        self.file_codes = copy(self.file_codes)
+        self.station_codes = copy(self.station_codes)
+        self.target_codes = copy(self.target_codes)
+        self.columns = {name: copy(array) for name, array in self.columns.items()}
+        if self.results is not None:
+            self.results = {name: copy(array) for name, array in self.results.items()}
+        # 解码缓存中保存着原来的天顶角列，一并释放
+        self._zenith_radians = None
+
+    def set_results(self, indices, results):
+        """
+        写入计算结果
+        参数：
+            indices (np.ndarray): 观测行号
+            results (dict): 列名 -> 与 indices 等长的数组
+        """
+        if self.results is None:
+            self.results = {name: np.full(len(self), np.nan) for name in RESULT_COLUMNS}
+        for name in RESULT_COLUMNS:
+            self.results[name][indices] = results[name]
+
+    def group_indices(self):
+        """
+        按 (测站, 目标) 分组
+        返回：
+            dict: 分组键 -> 观测行号数组，分组按首次出现的顺序排列，组内保持原始顺序
+        """
+        if len(self) == 0:
+            return {}
+        pair_codes = self.station_codes.astype(np.int64) * max(len(self.labels), 1) + self.target_codes
+        _, first, inverse = np.unique(pair_codes, return_index=True, return_inverse=True)
+        order = np.argsort(inverse, kind='stable')
+        bounds = np.concatenate(([0], np.cumsum(np.bincount(inverse)))).tolist()
+        return {self.key(first[g]): order[bounds[g]:bounds[g + 1]] for g in np.argsort(first).tolist()}
+
+    def grouped(self):
+        """返回按 (测站, 目标) 分组的视图"""
+        return GroupedObservations(self, self.group_indices())
+
+
+class GroupView(Sequence):
+    """一组观测的只读视图，只保存行号，按需生成行数据"""
+
+    def __init__(self, store, indices):
+        self.store = store
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, k):
+        if isinstance(k, slice):
+            return [self.store.row(idx) for idx in self.indices[k]]
+        return self.store.row(self.indices[k])
+
+
+class GroupedObservations(Mapping):
+    """
+    按 (测站, 目标) 分组的观测数据
+    键的顺序即表格中的行顺序，值为 GroupView
+    """
+
+    def __init__(self, store, groups, pair_index=None):
+        self.store = store
+        self.groups = groups
+        self._pair_index = pair_index
+        self._indices = None  # 全部分组的观测行号，重复计算时共用
+
+    def __getitem__(self, key):
+        return GroupView(self.store, self.groups[key])
+
+    def __iter__(self):
+        return iter(self.groups)
+
+    def __len__(self):
+        return len(self.groups)
+
+    def __contains__(self, key):
+        return key in self.groups
+
+    def reorder(self, keys):
+        """按指定键顺序返回新的分组视图，共享同一份观测数据和配对索引"""
+        return GroupedObservations(self.store, {key: self.groups[key] for key in keys}, self._pair_index)
+
+    def indices(self):
+        """返回全部分组的观测行号（按键的顺序拼接），首次调用时建立，参数修改后重新计算时直接复用"""
+        if self._indices is None:
+            groups = list(self.groups.values())
+            self._indices = np.concatenate(groups).astype(np.intp) if groups else np.empty(0, dtype=np.intp)
+        return self._indices
+
+    def pair_index(self):
+        """返回往返观测配对索引，首次调用时建立；配对与键的顺序无关，重新排序后继续使用"""
+        if self._pair_index is None:
+            self._pair_index = PairIndex(self.groups)
+        return self._pair_index
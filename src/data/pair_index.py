@@ -0,0 +1,60 @@
+class PairIndex:
+    """
+    往返观测配对索引
+
+    (a, b) 与 (b, a) 两个分组为一对往返观测，按键直接配对，与分组或表格中的行顺序无关。
+    每对中首个观测行号较小（在外业手簿中先出现）的分组为往测，另一组为返测，
+    与原来按首次出现顺序配对的结果一致；找不到 (b, a) 的分组为未配对分组。
+    """
+
+    def __init__(self, groups):
+        """
+        参数：
+            groups (dict): 分组键 -> 观测行号数组，例如 GroupedObservations.groups
+        """
+        self.forward = []  # 每对的往测分组键，序号即对的编号
+        self.backward = []  # 每对的返测分组键
+        self.unpaired = []  # 未配对的分组键，按分组顺序排列
+        self._pairs = {}  # 分组键 -> (对的编号, 是否为往测)
+        for key in groups:
+            if key in self._pairs:
+                continue
+            reverse_key = (key[1], key[0])
+            if reverse_key == key or reverse_key not in groups:
+                self.unpaired.append(key)
+                continue
+            forward, backward = ((key, reverse_key) if groups[key][0] <= groups[reverse_key][0]
+                                 else (reverse_key, key))
+            pair_id = len(self.forward)
+            self.forward.append(forward)
+            self.backward.append(backward)
+            self._pairs[forward] = (pair_id, True)
+            self._pairs[backward] = (pair_id, False)
+
+    def __len__(self):
+        return len(self.forward)
+
+    def __contains__(self, key):
+        return key in self._pairs
+
+    def pairs(self):
+        """返回全部 (往测键, 返测键)，按对的编号排列"""
+        return list(zip(self.forward, self.backward))
+
+    def pair_id(self, key):
+        """返回分组所在对的编号，未配对时为 None"""
+        pair = self._pairs.get(key)
+        return pair[0] if pair else None
+
+    def is_forward(self, key):
+        """分组是否为一对中的往测"""
+        pair = self._pairs.get(key)
+        return bool(pair and pair[1])
+
+    def partner(self, key):
+        """返回与分组配对的另一组的键，未配对时为 None"""
+        pair = self._pairs.get(key)
+        if pair is None:
+            return None
+        pair_id, forward = pair
+        return self.backward[pair_id] if forward else self.forward[pair_id]
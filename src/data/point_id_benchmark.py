@@ -0,0 +1,132 @@
+"""
+点名解析的等价性检查和性能测试
+
+用法：
+    python -m src.data.point_id_benchmark [-n 点名数] [-s 随机数种子]
+
+生成大量模拟点名（ASCII、全角字符、中文、括号、上标数字等），逐个检查 parse_point_id
+与原来按字符循环分组的 group_by_type 结果一致，并比较两者的耗时。
+"""
+import argparse
+import random
+import sys
+import time
+
+from src.data.data_oop import parse_point_id
+
+# 固定检查的点名，覆盖文档中的示例和常见的外业手簿文件名
+FIXED_NAMES = (
+    "", "A", "7", "-", "A123-XYZ", "T45(南)", "KZ03SS-0519", "KZ16-0519", "0519KZ", "JS02", "南山01",
+    "ＫＺ０３－１", "ＫＺ03(北)", "T４５", "KZ²3", "²³KZ", "Ⅻ12", "(T45)", "__KZ", "KZ 03", "北-01",
+)
+
+# 生成点名用的字符：ASCII 字母、数字、符号，全角字母、数字、符号，中文，以及 isdigit 为真但不是十进制数字的字符
+CHARACTER_SETS = (
+    "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz",
+    "0123456789",
+    "-_()[].# /",
+    "ＡＢＣＫＺＴａｂｃ",
+    "０１２３４５６７８９",
+    "－（）［］＃　",
+    "南北东西山河村桥点站",
+    "²³¹①②Ⅻ",
+)
+
+
+def legacy_group_by_type(s):
+    """原来 MeasurementData.group_by_type 的实现：逐个字符比较类型后拼接分组，返回前两组字符"""
+    if not s:
+        return ""
+
+    groups = []
+    current_group = s[0]
+
+    def char_type(c):
+        if c.isdigit():
+            return 'digit'
+        elif c.isalpha():
+            return 'alpha'
+        else:
+            return 'symbol'
+
+    for i in range(1, len(s)):
+        if char_type(s[i]) == char_type(current_group[-1]):
+            current_group += s[i]
+        else:
+            groups.append(current_group)
+            current_group = s[i]
+
+    groups.append(current_group)
+    return groups[0] + groups[1] if len(groups) > 1 else groups[0]
+
+
+def generate_names(count, seed=0):
+    """
+    生成模拟点名：由 1 ~ 5 段同类字符组成，约一半为纯 ASCII 点名，其余混入全角字符和中文
+    参数：
+        count (int): 点名数（不含 FIXED_NAMES）
+        seed (int): 随机数种子
+    返回：
+        list: FIXED_NAMES 加上 count 个生成的点名
+    """
+    rng = random.Random(seed)
+    names = list(FIXED_NAMES)
+    for _ in range(count):
+        sets = CHARACTER_SETS[:3] if rng.random() < 0.5 else CHARACTER_SETS
+        names.append(''.join(''.join(rng.choices(rng.choice(sets), k=rng.randint(1, 4)))
+                             for _ in range(rng.randint(1, 5))))
+    return names
+
+
+def find_mismatches(names):
+    """返回 parse_point_id 与原实现结果不一致的 [(点名, 原结果, 新结果), ...]"""
+    mismatches = []
+    for name in names:
+        expected, actual = legacy_group_by_type(name), parse_point_id(name)
+        if expected != actual:
+            mismatches.append((name, expected, actual))
+    return mismatches
+
+
+def run_benchmark(names, repeats=3):
+    """
+    比较原实现和 parse_point_id 的耗时，取 repeats 次中最快的一次
+    返回：
+        dict: legacy 为原实现，cold 为清空缓存后首次解析，warm 为缓存命中后再次解析（单位 s）
+    """
+    def best(fn, setup=None):
+        timings = []
+        for _ in range(repeats):
+            if setup is not None:
+                setup()
+            start = time.perf_counter()
+            for name in names:
+                fn(name)
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    legacy = best(legacy_group_by_type)
+    cold = best(parse_point_id, setup=parse_point_id.cache_clear)
+    warm = best(parse_point_id)
+    return {"legacy": legacy, "cold": cold, "warm": warm}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="点名解析的等价性检查和性能测试")
+    parser.add_argument("-n", "--names", type=int, default=200000, help="生成的点名数")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args(argv)
+
+    names = generate_names(args.names, args.seed)
+    mismatches = find_mismatches(names)
+    print(f"点名数: {len(names)}，不一致: {len(mismatches)}")
+    for name, expected, actual in mismatches[:10]:
+        print(f"    {name!r}: 原实现 {expected!r}，parse_point_id {actual!r}")
+    timings = run_benchmark(names)
+    print(f"原实现 {timings['legacy']:.3f} s，parse_point_id 首次 {timings['cold']:.3f} s，"
+          f"缓存命中 {timings['warm']:.3f} s")
+    return 0 if not mismatches else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from src.data.observation_store import ObservationStore, GroupedObservations, NUMERIC_COLUMNS, RESULT_COLUMNS
+
+# 项目文件标识和格式版本
+PROJECT_MAGIC = b"TLPROJ01"
+PROJECT_VERSION = 1
+# 数组数据按 64 字节对齐，便于内存映射
+ALIGNMENT = 64
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+def save_project(file_path, store, grouped_data=None, row_keys=None, current_indices=None):
+    """
+    保存项目文件
+
+    文件结构：标识(8 字节) + 头部长度(8 字节) + JSON 头部 + 按 64 字节对齐的列数组。
+    先写入临时文件，成功后再替换目标文件，避免保存中断损坏原有项目；
+    保存前会把内存映射的列复制到内存中，以便覆盖当前打开的项目文件。
+    参数：
+        file_path (str): 项目文件路径
+        store (ObservationStore): 观测数据
+        grouped_data (GroupedObservations): 匹配后的分组数据，未匹配时为 None
+        row_keys (list): 匹配表中每一行对应的分组键（用户拖拽后的行顺序）
+        current_indices (dict): 分组键 -> 当前选中的观测序号
+    """
+    store.detach()
+    arrays = {
+        "file_codes": store.file_codes,
+        "station_codes": store.station_codes,
+        "target_codes": store.target_codes,
+    }
+    for name in NUMERIC_COLUMNS:
+        arrays["column_" + name] = store.columns[name]
+    if store.results is not None:
+        for name in RESULT_COLUMNS:
+            arrays["result_" + name] = store.results[name]
+
+    header = {
+        "version": PROJECT_VERSION,
+        "width": store.width,
+        "labels": store.labels,
+        "has_results": store.results is not None,
+        "matched": False,
+    }
+    if grouped_data is not None:
+        # 分组键、行顺序和当前选中的观测均以整数数组保存
+        group_keys = list(grouped_data.keys())
+        key_positions = {key: pos for pos, key in enumerate(group_keys)}
+        groups = [grouped_data.groups[key] for key in group_keys]
+        current_indices = current_indices or {}
+        row_keys = list(row_keys) if row_keys is not None else group_keys
+        header["matched"] = True
+        arrays["group_station_codes"] = np.array([store.label_codes[key[0]] for key in group_keys], dtype=np.int32)
+        arrays["group_target_codes"] = np.array([store.label_codes[key[1]] for key in group_keys], dtype=np.int32)
+        arrays["group_indices"] = np.concatenate(groups).astype(np.int64) if groups else np.empty(0, dtype=np.int64)
+        arrays["group_offsets"] = np.cumsum([0] + [len(group) for group in groups]).astype(np.int64)
+        arrays["current_indices"] = np.array([current_indices.get(key, 0) for key in group_keys], dtype=np.int32)
+        arrays["row_order"] = np.array([key_positions[key] for key in row_keys], dtype=np.int32)
+
+    # 计算各数组在文件中的偏移量（头部长度未知，先按相对偏移排布）
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        arrays[name] = array
+        offset = _align(offset)
+        layout[name] = {"dtype": array.dtype.str, "shape": list(array.shape), "offset": offset}
+        offset += array.nbytes
+    header["arrays"] = layout
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    data_start = _align(len(PROJECT_MAGIC) + 8 + len(header_bytes))
+
+    temp_file = file_path + ".tmp"
+    try:
+        with open(temp_file, 'wb') as f:
+            f.write(PROJECT_MAGIC)
+            f.write(struct.pack('<Q', len(header_bytes)))
+            f.write(header_bytes)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(array.tobytes())
+        os.replace(temp_file, file_path)
+    except Exception:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
+
+
+def load_project(file_path):
+    """
+    加载项目文件，列数组以写时复制方式内存映射，不会修改磁盘上的文件
+    返回：
+        dict: store (ObservationStore)、grouped_data (GroupedObservations 或 None)、
+              row_keys (list 或 None)、current_indices (dict 或 None)
+    """
+    with open(file_path, 'rb') as f:
+        if f.read(len(PROJECT_MAGIC)) != PROJECT_MAGIC:
+            raise ValueError("不是有效的项目文件")
+        header_length, = struct.unpack('<Q', f.read(8))
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    if header["version"] != PROJECT_VERSION:
+        raise ValueError(f"不支持的项目文件版本: {header['version']}")
+    data_start = _align(len(PROJECT_MAGIC) + 8 + header_length)
+
+    def array(name):
+        info = header["arrays"][name]
+        shape = tuple(info["shape"])
+        if 0 in shape:
+            return np.empty(shape, dtype=info["dtype"])
+        return np.memmap(file_path, dtype=info["dtype"], mode='c',
+                         offset=data_start + info["offset"], shape=shape)
+
+    store = ObservationStore(header["width"])
+    store.labels = header["labels"]
+    store.label_codes = {label: code for code, label in enumerate(store.labels)}
+    store.file_codes = array("file_codes")
+    store.station_codes = array("station_codes")
+    store.target_codes = array("target_codes")
+    store.columns = {name: array("column_" + name) for name in NUMERIC_COLUMNS}
+    if header["has_results"]:
+        store.results = {name: array("result_" + name) for name in RESULT_COLUMNS}
+
+    project = {"store": store, "grouped_data": None, "row_keys": None, "current_indices": None}
+    if header["matched"]:
+        labels = store.labels
+        group_keys = [(labels[station], labels[target]) for station, target in
+                      zip(array("group_station_codes").tolist(), array("group_target_codes").tolist())]
+        # 分组行号数据量小，直接读入内存
+        offsets = array("group_offsets").tolist()
+        indices = np.array(array("group_indices"))
+        groups = [indices[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+        project["grouped_data"] = GroupedObservations(store, dict(zip(group_keys, groups)))
+        project["row_keys"] = [group_keys[pos] for pos in array("row_order").tolist()]
+        project["current_indices"] = dict(zip(group_keys, array("current_indices").tolist()))
+    return project
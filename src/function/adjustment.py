@@ -0,0 +1,134 @@
+"""
+三角高程网平差
+
+以往返观测的高差中数为观测值、未知点高程为参数进行间接平差，权按边长取 P = 1 / S(km)。
+法方程用稀疏矩阵组成并分解，适用于数万个点的高程网。
+"""
+import numpy as np
+
+# 边长下限(m)，避免极短边的权过大
+MIN_DISTANCE = 1.0
+
+
+def _inverse_diagonal(normal):
+    """
+    求法方程 N 的逆矩阵（协因数阵）的对角线
+
+    先用逆 Cuthill-McKee 排序把 N 变为带状矩阵并做带状 Cholesky 分解 N = C·Cᵀ，
+    再按 Takahashi 递推从最后一列向前只计算带内的逆矩阵元素，耗时与 点数 × 带宽² 成正比。
+    """
+    from scipy.linalg import cholesky_banded
+    from scipy.sparse.csgraph import reverse_cuthill_mckee
+
+    size = normal.shape[0]
+    order = reverse_cuthill_mckee(normal.tocsr(), symmetric_mode=True)
+    permuted = normal.tocsr()[order][:, order].tocoo()
+    bandwidth = int(np.abs(permuted.row - permuted.col).max()) if permuted.nnz else 0
+    banded = np.zeros((bandwidth + 1, size))
+    lower = permuted.row >= permuted.col
+    banded[(permuted.row - permuted.col)[lower], permuted.col[lower]] = permuted.data[lower]
+    factor = cholesky_banded(banded, lower=True)
+
+    # window 为已求出的逆矩阵在第 j 列之后 bandwidth 行、列内的元素
+    diagonal = np.empty(size)
+    window = np.empty((0, 0))
+    for j in range(size - 1, -1, -1):
+        span = min(len(window), bandwidth)
+        ratio = factor[1:span + 1, j] / factor[0, j]
+        column = -window[:span, :span] @ ratio
+        diagonal[j] = 1 / factor[0, j] ** 2 - ratio @ column
+        keep = max(min(span, bandwidth - 1), 0)
+        new_window = np.empty((keep + 1, keep + 1))
+        new_window[0, 0] = diagonal[j]
+        new_window[1:, 0] = new_window[0, 1:] = column[:keep]
+        new_window[1:, 1:] = window[:keep, :keep]
+        window = new_window
+
+    result = np.empty(size)
+    result[order] = diagonal
+    return result
+
+
+def adjust_height_network(observations, fixed_heights, precision=True):
+    """
+    高程网间接平差
+    参数：
+        observations (list): 每项为 (起点, 终点, 高差(m), 平距(m))，高差为终点高程减起点高程
+        fixed_heights (dict): 已知点名 -> 高程(m)
+        precision (bool): 是否计算各未知点的高程中误差，点数很多时可以关闭以节省时间
+    返回：
+        dict:
+            heights: 点名 -> 平差后高程(m)，包含已知点
+            precisions: 未知点名 -> 高程中误差(mm)，precision 为 False 时为空
+            residuals: 与 observations 对应的改正数(mm)
+            adjusted: 与 observations 对应的平差后高差(m)
+            sigma0: 单位权（1 km）中误差(mm)，没有多余观测时为 NaN
+            dof: 多余观测数
+    """
+    import scipy.sparse as sp
+    from scipy.sparse.csgraph import connected_components
+    from scipy.sparse.linalg import splu
+
+    if not observations:
+        raise ValueError("没有可平差的高差观测")
+    starts, ends, height_differences, distances = zip(*observations)
+    point_codes = {}
+    codes = np.array([point_codes.setdefault(name, len(point_codes)) for name in starts + ends], dtype=np.intp)
+    names = np.array(list(point_codes), dtype=object)
+    count = len(observations)
+    start_codes, end_codes = codes[:count], codes[count:]
+    height_differences = np.asarray(height_differences, dtype=float)
+    weights = 1000.0 / np.maximum(np.abs(np.asarray(distances, dtype=float)), MIN_DISTANCE)
+
+    fixed = np.array([name in fixed_heights for name in names.tolist()], dtype=bool)
+    if not fixed.any():
+        raise ValueError("观测中没有已知点，无法平差")
+    known = np.array([fixed_heights.get(name, 0.0) for name in names.tolist()], dtype=float)
+
+    # 每个连通的子网都需要至少一个已知点
+    graph = sp.coo_matrix((np.ones(count), (start_codes, end_codes)), shape=(len(names), len(names)))
+    _, labels = connected_components(graph, directed=False)
+    isolated = ~np.isin(labels, labels[fixed])
+    if isolated.any():
+        raise ValueError("以下点与已知点不连通，无法平差：" + "、".join(names[isolated][:20].tolist())
+                         + (" 等" if isolated.sum() > 20 else ""))
+
+    # 未知点编号；已知点的高程移到常数项
+    unknown_codes = np.full(len(names), -1)
+    unknown_codes[~fixed] = np.arange((~fixed).sum())
+    unknown_count = int((~fixed).sum())
+    constant = height_differences + known[start_codes] * fixed[start_codes] - known[end_codes] * fixed[end_codes]
+
+    rows, columns, values = [], [], []
+    for codes_at_end, sign in ((end_codes, 1.0), (start_codes, -1.0)):
+        free = ~fixed[codes_at_end]
+        rows.append(np.flatnonzero(free))
+        columns.append(unknown_codes[codes_at_end[free]])
+        values.append(np.full(free.sum(), sign))
+    design = sp.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(columns))),
+                           shape=(count, unknown_count))
+
+    heights = known.copy()
+    precisions = {}
+    residuals = -constant
+    dof = count - unknown_count
+    if unknown_count:
+        weighted = design.T.multiply(weights).tocsr()
+        normal = (weighted @ design).tocsc()
+        lu = splu(normal, permc_spec='MMD_AT_PLUS_A', diag_pivot_thresh=0, options=dict(SymmetricMode=True))
+        solution = lu.solve(weighted @ constant)
+        heights[~fixed] = solution
+        residuals = design @ solution - constant
+    sigma0 = np.sqrt(np.sum(weights * residuals ** 2) / dof) if dof > 0 else np.nan
+    if unknown_count and precision and dof > 0:
+        point_sigma = sigma0 * np.sqrt(_inverse_diagonal(normal)) * 1000
+        precisions = dict(zip(names[~fixed].tolist(), point_sigma.tolist()))
+
+    return {
+        "heights": dict(zip(names.tolist(), heights.tolist())),
+        "precisions": precisions,
+        "residuals": (residuals * 1000).tolist(),
+        "adjusted": (height_differences + residuals).tolist(),
+        "sigma0": float(sigma0 * 1000),
+        "dof": dof,
+    }
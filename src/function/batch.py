@@ -0,0 +1,125 @@
+"""
+命令行批处理：导入 → 匹配 → 计算 → 导出，不依赖 PyQt6
+
+用法：
+    python batch.py 输入1 [输入2 ...] -o 输出目录
+
+输入为目录时，解析其中的外业手簿并导出外业测量数据表；
+输入为 .xlsx 外业手簿匹配表时，进行分组匹配、测量计算和往返计算，导出三角高程测量计算总表；
+指定 --best 时每对往返观测自动选择往返不符值最小的观测组合；
+指定 --fixed 已知点高程文件时，再进行高程网平差并导出平差结果。
+"""
+import argparse
+import os
+import sys
+import time
+
+from src.data.data_oop import MeasurementData
+from src.data.data_service import DataService
+from src.data.ingest_cache import IngestCache
+from src.function.logger import log_operation, log_error
+from src.function.measurement import Measurement
+
+
+class StageTimer:
+    """记录各处理阶段的耗时"""
+
+    def __init__(self):
+        self.timings = []
+
+    def run(self, stage, func, *args, **kwargs):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        self.timings.append((stage, time.perf_counter() - start))
+        return result
+
+    def report(self, title):
+        lines = [f"{title}:"]
+        lines.extend(f"  {stage}: {elapsed:.3f} s" for stage, elapsed in self.timings)
+        lines.append(f"  合计: {sum(elapsed for _, elapsed in self.timings):.3f} s")
+        return "\n".join(lines)
+
+
+def process_directory(path, output_dir, data_service, workers=None, cache=None):
+    """解析外业手簿目录，导出外业测量数据表"""
+    timer = StageTimer()
+    example = timer.run("导入", MeasurementData, path, workers=workers, cache=cache)
+    output_file = os.path.join(output_dir, os.path.basename(os.path.normpath(path)) + "_外业测量数据.xlsx")
+    timer.run("导出", data_service.export_excel, example.observations, output_file, calculated=False)
+    return output_file, len(example.observations), timer
+
+
+def process_matching_table(file_path, output_dir, data_service, tolerance_factor, fixed_heights=None, best=False,
+                           workers=None):
+    """
+    对外业手簿匹配表进行匹配、计算，导出三角高程测量计算总表；
+    workers 大于 1 时按测站分片多进程计算，best 为 True 时自动选择最优观测组合，提供已知点高程时再进行高程网平差
+    """
+    timer = StageTimer()
+    data = timer.run("导入", data_service.import_excel, file_path)
+    grouped_data = timer.run("分组", data_service.group_data, data)
+    grouped_data = timer.run("匹配计算", data_service.sort_and_calculate, grouped_data, workers)
+    current_indices = None
+    if best:
+        from src.function.combination_optimizer import best_current_indices
+
+        current_indices, _ = timer.run("最优组合", best_current_indices, grouped_data, tolerance_factor)
+    rows = timer.run("往返计算", data_service.calculate_pairs, grouped_data, current_indices,
+                     tolerance_factor=tolerance_factor)
+    output_file = os.path.join(output_dir, os.path.splitext(os.path.basename(file_path))[0] + "_三角高程测量计算总表.xlsx")
+    timer.run("导出", data_service.export_excel, rows, output_file, calculated=True)
+    if fixed_heights:
+        from src.function.adjustment import adjust_height_network
+
+        observations = timer.run("平差观测", data_service.reciprocal_height_differences, grouped_data, current_indices)
+        result = timer.run("高程网平差", adjust_height_network, observations, fixed_heights)
+        adjustment_file = os.path.join(output_dir,
+                                       os.path.splitext(os.path.basename(file_path))[0] + "_高程网平差.xlsx")
+        timer.run("导出平差结果", data_service.export_adjustment, observations, result, fixed_heights,
+                  adjustment_file)
+    return output_file, len(data), timer
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="三角高程批处理：导入 → 匹配 → 计算 → 导出")
+    parser.add_argument("inputs", nargs="+", help="外业手簿目录或外业手簿匹配表(.xlsx)")
+    parser.add_argument("-o", "--output-dir", default=".", help="输出目录，默认当前目录")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="解析外业手簿和分片计算的进程数")
+    parser.add_argument("--no-cache", action="store_true", help="不使用外业手簿解析缓存")
+    parser.add_argument("--best", action="store_true", help="每对往返观测自动选择往返不符值最小的观测组合")
+    parser.add_argument("--fixed", default=None, help="已知点高程文件(.xlsx/.txt/.csv)，指定时进行高程网平差")
+    parser.add_argument("--tolerance-factor", type=float, default=None, help="限差系数，默认读取参数设置")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    tolerance_factor = args.tolerance_factor
+    if tolerance_factor is None:
+        tolerance_factor = Measurement.load_parameters().get("tolerance_factor", 40)
+    cache = None if args.no_cache else IngestCache()
+    data_service = DataService()
+    fixed_heights = data_service.read_fixed_heights(args.fixed) if args.fixed else None
+
+    failed = 0
+    total_start = time.perf_counter()
+    for path in args.inputs:
+        try:
+            if os.path.isdir(path):
+                output_file, count, timer = process_directory(path, args.output_dir, data_service,
+                                                              workers=args.workers, cache=cache)
+            elif path.lower().endswith(".xlsx"):
+                output_file, count, timer = process_matching_table(path, args.output_dir, data_service,
+                                                                   tolerance_factor, fixed_heights, args.best,
+                                                                   args.workers)
+            else:
+                print(f"跳过不支持的输入: {path}", file=sys.stderr)
+                failed += 1
+                continue
+        except Exception as e:
+            log_error(e, f"批处理失败: {path}")
+            print(f"处理失败: {path} - {e}", file=sys.stderr)
+            failed += 1
+            continue
+        print(timer.report(f"{path} ({count} 条观测) -> {output_file}"))
+        log_operation(f"批处理完成: {path} -> {output_file}", "INFO")
+    print(f"全部完成，共 {len(args.inputs)} 个输入，失败 {failed} 个，总耗时 {time.perf_counter() - total_start:.3f} s")
+    return 1 if failed else 0
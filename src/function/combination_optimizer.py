@@ -0,0 +1,86 @@
+"""
+往返观测最优组合选择
+
+同一 (测站, 目标) 有多组观测时，每对往返观测共有 往测组数 × 返测组数 种组合。
+这里把全部对的全部组合展开为一维数组一次性计算往返不符值和限差，
+每对按“不超限优先、往返不符值绝对值从小到大”排序，取最优的一个或前 N 个组合。
+"""
+import numpy as np
+
+
+def rank_combinations(grouped_data, tolerance_factor=40, top_n=1):
+    """
+    计算每对往返观测全部组合的往返不符值，返回每对最优的前 top_n 个组合
+    参数：
+        grouped_data (GroupedObservations): 已写入计算结果的分组数据
+        tolerance_factor (float): 限差系数
+        top_n (int): 每对保留的组合数
+    返回：
+        dict: 按对的编号、名次排列的数组
+            pairs: 对的编号（PairIndex 中的序号）
+            forward_indices, backward_indices: 往测、返测分组中的观测序号（即 current_indices 的取值）
+            sum_values: 往返不符值(mm)
+            tolerances: 限差(mm)
+            exceeded: 是否超限
+    """
+    pair_index = grouped_data.pair_index()
+    groups = grouped_data.groups
+    forward_groups = [np.asarray(groups[key], dtype=np.intp) for key in pair_index.forward]
+    backward_groups = [np.asarray(groups[key], dtype=np.intp) for key in pair_index.backward]
+    forward_counts = np.array([len(group) for group in forward_groups], dtype=np.intp)
+    backward_counts = np.array([len(group) for group in backward_groups], dtype=np.intp)
+    if not len(forward_groups):
+        empty = np.empty(0, dtype=np.intp)
+        return {"pairs": empty, "forward_indices": empty, "backward_indices": empty,
+                "sum_values": np.empty(0), "tolerances": np.empty(0), "exceeded": np.empty(0, dtype=bool)}
+
+    def starts(counts):
+        return np.concatenate(([0], np.cumsum(counts)[:-1]))
+
+    # 展开全部组合：第 p 对的组合按 (往测序号, 返测序号) 依次排列
+    sizes = forward_counts * backward_counts
+    pairs = np.repeat(np.arange(len(sizes)), sizes)
+    offsets = np.arange(len(pairs)) - starts(sizes)[pairs]
+    forward_indices = offsets // backward_counts[pairs]
+    backward_indices = offsets % backward_counts[pairs]
+    first = np.concatenate(forward_groups)[starts(forward_counts)[pairs] + forward_indices]
+    second = np.concatenate(backward_groups)[starts(backward_counts)[pairs] + backward_indices]
+
+    # 与 Measurement.calculate_pair 相同的公式，缺失的计算结果按 0 处理
+    results = grouped_data.store.results
+    heights, distances = np.nan_to_num(results["height"]), np.nan_to_num(results["d"])
+    sum_values = (heights[first] + heights[second]) * 1000
+    tolerances = tolerance_factor * np.sqrt(0.5 * (np.abs(distances[first]) + np.abs(distances[second])) / 1000)
+    exceeded = np.abs(sum_values) > tolerances
+
+    # 每对内不超限的组合在前，再按往返不符值绝对值排序；相同时保持原来的组合顺序
+    order = np.lexsort((np.abs(sum_values), exceeded, pairs))
+    ranks = np.arange(len(order)) - starts(sizes)[pairs[order]]
+    order = order[ranks < top_n]
+    return {
+        "pairs": pairs[order],
+        "forward_indices": forward_indices[order],
+        "backward_indices": backward_indices[order],
+        "sum_values": sum_values[order],
+        "tolerances": tolerances[order],
+        "exceeded": exceeded[order],
+    }
+
+
+def best_current_indices(grouped_data, tolerance_factor=40):
+    """
+    为每对往返观测选择往返不符值最小的组合（优先选择不超限的组合）
+    参数：
+        grouped_data (GroupedObservations): 已写入计算结果的分组数据
+        tolerance_factor (float): 限差系数
+    返回：
+        tuple: (current_indices, 仍超限的对数)。current_indices 为 分组键 -> 观测序号，只包含已配对的分组
+    """
+    pair_index = grouped_data.pair_index()
+    ranked = rank_combinations(grouped_data, tolerance_factor, top_n=1)
+    current_indices = {}
+    for pair_id, forward_index, backward_index in zip(ranked["pairs"].tolist(), ranked["forward_indices"].tolist(),
+                                                      ranked["backward_indices"].tolist()):
+        current_indices[pair_index.forward[pair_id]] = forward_index
+        current_indices[pair_index.backward[pair_id]] = backward_index
+    return current_indices, int(ranked["exceeded"].sum())
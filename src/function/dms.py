@@ -0,0 +1,124 @@
+"""
+度分秒（DDD.MMSS 格式）角度解码
+
+天顶角等角度以 DDD.MMSS 的十进制数记录，例如 84.39384 表示 84°39'38.4"。
+按浮点数逐位相减取分、秒会受二进制误差影响，例如 84.57 会被解码为 84°56'99.99"，
+这里先还原出角度的十进制数字（文本直接按数字解析，浮点数取能精确还原该值的最短小数位数），
+再用整数运算拆分度、分、秒，最后只做一次除法得到十进制度，结果为精确值的正确舍入。
+"""
+import math
+from functools import lru_cache
+
+import numpy as np
+
+# 支持的最大小数位数：MMSS 之后再保留 5 位秒的小数
+MAX_DECIMALS = 9
+
+
+def _to_float(value):
+    """转换为浮点数，无法转换时为 NaN"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _decode_scaled(scaled, decimals):
+    """
+    由按 10^decimals 放大后的整数解码为十进制度
+    参数：
+        scaled (np.ndarray): 角度绝对值乘以 10^decimals 后的整数（int64）
+        decimals (int | np.ndarray): 小数位数，不小于 4，可以逐个不同
+    """
+    unit = 10 ** (np.asarray(decimals, dtype=np.int64) - 4)  # 每秒包含的最小单位数
+    degrees = scaled // (10000 * unit)
+    minutes = scaled // (100 * unit) % 100
+    seconds = scaled % (100 * unit)
+    total = (degrees * 3600 + minutes * 60) * unit + seconds
+    return total / (3600 * unit)
+
+
+def _decode_float(values):
+    """浮点数组解码为十进制度，按能精确还原每个值的最短小数位数解析"""
+    magnitude = np.abs(values)
+    finite = np.isfinite(magnitude)
+    magnitude = np.where(finite, magnitude, 0)
+    # 每个值取能精确还原的最短小数位数（至少 4 位），超过 MAX_DECIMALS 位的按四舍五入处理
+    decimals = np.full(values.shape, MAX_DECIMALS, dtype=np.int64)
+    for candidate in range(MAX_DECIMALS - 1, 3, -1):
+        scale = 10.0 ** candidate
+        decimals[np.round(magnitude * scale) / scale == magnitude] = candidate
+    scaled = np.round(magnitude * 10.0 ** decimals).astype(np.int64)
+    result = _decode_scaled(scaled, decimals)
+    return np.where(finite, np.copysign(result, values), np.nan)
+
+
+def _decode_text(values):
+    """文本数组解码为十进制度，按文本中的数字解析；无法按数字解析的文本转为浮点数后解码"""
+    texts = np.char.strip(values.astype(str))
+    negative = np.char.startswith(texts, '-')
+    texts = np.char.lstrip(texts, '+-')
+    parts = np.char.partition(texts, '.')
+    integer, fraction = parts[..., 0], parts[..., 2]
+    valid = (np.char.isdigit(integer) & (np.char.isdigit(fraction) | (np.char.str_len(fraction) == 0))
+             & (np.char.str_len(integer) <= 6) & (np.char.str_len(fraction) <= MAX_DECIMALS))
+
+    result = np.full(texts.shape, np.nan)
+    if valid.any():
+        decimals = max(4, int(np.char.str_len(fraction[valid]).max()))
+        padded = np.char.ljust(fraction[valid], decimals, '0')
+        scaled = integer[valid].astype(np.int64) * 10 ** decimals + padded.astype(np.int64)
+        result[valid] = _decode_scaled(scaled, decimals)
+    result = np.where(negative, -result, result)
+
+    others = ~valid
+    if others.any():
+        result[others] = _decode_float(np.array([_to_float(text) for text in values[others].tolist()]))
+    return result
+
+
+def dms_to_degrees(values):
+    """
+    将 DDD.MMSS 格式的角度数组解码为十进制度
+    参数：
+        values (array_like): 浮点数或文本，文本按原始数字解析；空值和无法解析的值为 NaN
+    返回：
+        np.ndarray: 十进制度（float64）
+    """
+    values = np.asarray(values)
+    if values.dtype.kind in 'US':
+        return _decode_text(values)
+    if values.dtype.kind == 'O':
+        texts = np.array([isinstance(value, str) for value in values.ravel()]).reshape(values.shape)
+        result = np.empty(values.shape)
+        result[texts] = _decode_text(values[texts].astype(str))
+        result[~texts] = _decode_float(np.array([_to_float(value) for value in values[~texts].tolist()]))
+        return result
+    return _decode_float(values.astype(float))
+
+
+def dms_to_radians(values):
+    """将 DDD.MMSS 格式的角度数组解码为弧度"""
+    return dms_to_degrees(values) * (math.pi / 180)
+
+
+@lru_cache(maxsize=65536)
+def dms_value_to_degrees(value):
+    """
+    单个 DDD.MMSS 格式角度解码为十进制度，用于逐行计算，与 dms_to_degrees 的结果一致
+    参数：
+        value (float | str): 角度值或原始文本
+    """
+    if isinstance(value, str):
+        return float(_decode_text(np.array([value]))[0])
+    value = _to_float(value)
+    if not math.isfinite(value):
+        return math.nan
+    magnitude = abs(value)
+    decimals = 4
+    while decimals < MAX_DECIMALS and round(magnitude * 10.0 ** decimals) / 10.0 ** decimals != magnitude:
+        decimals += 1
+    scaled = round(magnitude * 10.0 ** decimals)
+    unit = 10 ** (decimals - 4)
+    total = (scaled // (10000 * unit) * 3600 + scaled // (100 * unit) % 100 * 60) * unit + scaled % (100 * unit)
+    return math.copysign(total / (3600 * unit), value)
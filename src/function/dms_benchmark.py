@@ -0,0 +1,157 @@
+"""
+度分秒解码的正确性检查和性能测试
+
+用法：
+    python -m src.function.dms_benchmark [-n 角度数] [-s 随机数种子]
+
+随机生成 DDD.MMSS 格式的角度（秒可带 0 ~ 5 位小数，含负值），用 Fraction 按十进制数字精确解码
+作为参考，检查 dms_to_degrees（浮点数组和文本数组）与 dms_value_to_degrees 的结果与参考值的
+正确舍入完全一致；再与原来 Measurement.calculate_all 中用 int() 截断、浮点数相减的解码比较：
+输出两者结果不同的角度数（区分超过 0.001" 的解码错误和末位舍入差异）及最大差值，并比较原解码、逐行 dms_value_to_degrees 与批量 dms_to_radians 的耗时。
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from fractions import Fraction
+
+import numpy as np
+
+from src.function.dms import dms_to_degrees, dms_to_radians, dms_value_to_degrees
+
+# 固定检查的角度：文档中的示例，以及原来逐位相减时解码错误的整秒值
+FIXED_TEXTS = ("84.39384", "106.19", "84.57", "90.0000", "0.0001", "0.5959", "359.5959", "-12.3045", "90.01005",
+               "89.75129")
+# 原解码与新解码相差超过该值（秒）时视为解码错误，否则为浮点数末位的舍入差异
+LEGACY_ERROR_SECONDS = 0.001
+
+
+def legacy_dms_to_degrees(z):
+    """原来 Measurement.calculate_all 中的解码：int() 截断度、分，秒由浮点数相减得到"""
+    degrees = int(z)
+    minutes = int((z - degrees) * 100)
+    seconds = (((z - degrees) * 100) - minutes) * 100
+    return degrees + minutes / 60 + seconds / 3600
+
+
+def reference_degrees(text):
+    """
+    按十进制数字精确解码 DDD.MMSS 文本，返回正确舍入的十进制度
+    参数：
+        text (str): 角度文本，例如 "84.39384"
+    """
+    negative = text.startswith('-')
+    integer, _, fraction = text.lstrip('+-').partition('.')
+    fraction = fraction.ljust(4, '0')
+    degrees = Fraction(int(integer))
+    minutes = Fraction(int(fraction[:2]))
+    seconds = Fraction(int(fraction[2:]), 10 ** (len(fraction) - 4))
+    value = float(degrees + minutes / 60 + seconds / 3600)
+    return -value if negative else value
+
+
+def generate_texts(count, seed=0):
+    """
+    生成角度文本：度 0 ~ 359，分、秒 0 ~ 59，秒带 0 ~ 5 位小数，约 5% 为负值
+    返回：
+        list: FIXED_TEXTS 加上 count 个生成的角度文本
+    """
+    rng = random.Random(seed)
+    texts = list(FIXED_TEXTS)
+    for _ in range(count):
+        decimals = rng.randint(0, 5)
+        fraction = ''.join(rng.choices('0123456789', k=decimals))
+        sign = '-' if rng.random() < 0.05 else ''
+        texts.append(f"{sign}{rng.randint(0, 359)}.{rng.randint(0, 59):02d}{rng.randint(0, 59):02d}{fraction}")
+    return texts
+
+
+def find_mismatches(texts):
+    """
+    返回与参考值不一致的 [(文本, 解码方式, 结果, 参考值), ...]
+    解码方式：float 为浮点数组，text 为文本数组，value 为逐个解码
+    """
+    expected = [reference_degrees(text) for text in texts]
+    decoded = {
+        "float": dms_to_degrees(np.array([float(text) for text in texts])).tolist(),
+        "text": dms_to_degrees(np.array(texts)).tolist(),
+        "value": [dms_value_to_degrees(float(text)) for text in texts],
+    }
+    mismatches = []
+    for method, values in decoded.items():
+        for text, value, reference in zip(texts, values, expected):
+            if value != reference:
+                mismatches.append((text, method, value, reference))
+    return mismatches
+
+
+def legacy_differences(texts):
+    """
+    比较原解码与 dms_value_to_degrees 的结果
+    返回：
+        list: 结果不同的 [(文本, 原解码, 新解码, 差值(秒)), ...]，按差值绝对值从大到小排列
+    """
+    differences = []
+    for text in texts:
+        old, new = legacy_dms_to_degrees(float(text)), dms_value_to_degrees(float(text))
+        if old != new:
+            differences.append((text, old, new, (old - new) * 3600))
+    differences.sort(key=lambda item: -abs(item[3]))
+    return differences
+
+
+def run_benchmark(values, repeats=3):
+    """
+    比较原解码、逐行解码与批量解码的耗时，取 repeats 次中最快的一次
+    返回：
+        dict: legacy 为逐行调用原解码并换算为弧度，per_row 为逐行调用 dms_value_to_degrees 并换算为弧度，
+              batch 为 dms_to_radians（单位 s）
+    """
+    def legacy():
+        return [legacy_dms_to_degrees(value) * (math.pi / 180) for value in values.tolist()]
+
+    def per_row():
+        dms_value_to_degrees.cache_clear()
+        return [math.radians(dms_value_to_degrees(value)) for value in values.tolist()]
+
+    def batch():
+        return dms_to_radians(values)
+
+    timings = {}
+    for name, fn in (("legacy", legacy), ("per_row", per_row), ("batch", batch)):
+        best = math.inf
+        for _ in range(repeats):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        timings[name] = best
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="度分秒解码的正确性检查和性能测试")
+    parser.add_argument("-n", "--angles", type=int, default=200000, help="生成的角度数")
+    parser.add_argument("-s", "--seed", type=int, default=0, help="随机数种子")
+    args = parser.parse_args(argv)
+
+    texts = generate_texts(args.angles, args.seed)
+    mismatches = find_mismatches(texts)
+    print(f"角度数: {len(texts)}，与参考值不一致: {len(mismatches)}")
+    for text, method, value, reference in mismatches[:10]:
+        print(f"    {text} ({method}): {value!r}，参考值 {reference!r}")
+    differences = legacy_differences(texts)
+    largest = abs(differences[0][3]) if differences else 0.0
+    errors = sum(abs(difference) >= LEGACY_ERROR_SECONDS for _, _, _, difference in differences)
+    print(f"原解码与新解码结果不同: {len(differences)}，其中相差 {LEGACY_ERROR_SECONDS}\" 以上 {errors}，"
+          f"其余为末位舍入差异；最大差值 {largest:.3g}\"")
+    examples = differences[:5] + [item for item in differences[5:] if item[0] in FIXED_TEXTS]
+    for text, old, new, difference in examples:
+        print(f"    {text}: 原解码 {old!r}，新解码 {new!r}，差 {difference:.3g}\"")
+    timings = run_benchmark(np.array([float(text) for text in texts]))
+    print(f"原解码 {timings['legacy']:.3f} s，逐行解码 {timings['per_row']:.3f} s，批量解码 {timings['batch']:.3f} s")
+    return 0 if not mismatches else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
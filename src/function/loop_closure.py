@@ -0,0 +1,155 @@
+"""
+高程网闭合环闭合差计算
+
+以测站为顶点、往返观测的边为边组成测站图，用广度优先生成树求基本闭合环：
+每条不在生成树上的边与树上连接其两端点的路径组成一个闭合环，全部基本环相互独立，
+网中任何闭合环的闭合差都可以由它们组合得到。
+
+生成树上各点相对根点的高差和路线长度只需计算一次，每个环的闭合差和环长由两端点的值和
+最近公共祖先得到，最近公共祖先用倍增表批量求出，总耗时约与 边数 × log(点数) 成正比。
+"""
+import numpy as np
+
+
+class StationGraph:
+    """
+    测站图索引
+    参数：
+        observations (list): 每项为 (起点, 终点, 高差(m), 平距(m))，高差为终点高程减起点高程，
+                             例如 DataService.reciprocal_height_differences 的返回值
+    """
+
+    def __init__(self, observations):
+        self.observations = list(observations)
+        count = len(self.observations)
+        starts, ends, height_differences, distances = (zip(*self.observations) if count else ((), (), (), ()))
+        point_codes = {name: code for code, name in enumerate(dict.fromkeys(starts + ends))}
+        self.names = list(point_codes)
+        self.starts = np.array([point_codes[name] for name in starts], dtype=np.intp)
+        self.ends = np.array([point_codes[name] for name in ends], dtype=np.intp)
+        self.height_differences = np.asarray(height_differences, dtype=float)
+        self.distances = np.abs(np.asarray(distances, dtype=float))
+        self._build_tree()
+
+    def _build_tree(self):
+        """
+        求广度优先生成树，记录各点的父点、父边、深度以及相对根点的高差和路线长度
+
+        每个连通部分取一个根点，并增加一个连接全部根点的虚拟点，只需一次遍历即可得到整个生成森林；
+        各点到根点的累计值用倍增（指针跳跃）批量求出，同时得到求最近公共祖先用的倍增表。
+        """
+        import scipy.sparse as sp
+        from scipy.sparse.csgraph import breadth_first_order, connected_components
+
+        size = len(self.names)
+        count = len(self.observations)
+        graph = sp.coo_matrix((np.ones(count), (self.starts, self.ends)), shape=(size, size))
+        _, labels = connected_components(graph, directed=False)
+        roots = np.unique(labels, return_index=True)[1]
+        virtual = sp.coo_matrix((np.ones(len(roots)), (np.full(len(roots), size), roots)), shape=(size + 1, size + 1))
+        forest = (sp.bmat([[graph, None], [None, sp.coo_matrix((1, 1))]]) + virtual).tocsr()
+        _, predecessors = breadth_first_order(forest, size, directed=False, return_predecessors=True)
+        parent = predecessors[:size].astype(np.intp)
+        parent[roots] = roots  # 根点的父点为自身
+
+        # 每个非根点的父边：按无向点对查找（平行边任取一条）
+        children = np.flatnonzero(parent != np.arange(size))
+        edge_pairs = np.minimum(self.starts, self.ends) * size + np.maximum(self.starts, self.ends)
+        edge_order = np.argsort(edge_pairs, kind='stable')
+        child_pairs = np.minimum(parent[children], children) * size + np.maximum(parent[children], children)
+        child_edges = edge_order[np.searchsorted(edge_pairs[edge_order], child_pairs)]
+        parent_edge = np.full(size, -1, dtype=np.intp)
+        parent_edge[children] = child_edges
+
+        # 各点到父点的高差、路线长度和深度增量，根点为 0
+        signs = np.where(self.starts[child_edges] == parent[children], 1.0, -1.0)
+        steps = np.zeros((3, size))
+        steps[0, children] = signs * self.height_differences[child_edges]
+        steps[1, children] = self.distances[child_edges]
+        steps[2, children] = 1
+        # 倍增：steps 累计到第 2^j 个祖先，直到全部祖先都是根点；ancestors[j] 为第 2^j 个祖先
+        ancestors = [parent]
+        while (ancestors[-1] != parent[ancestors[-1]]).any():
+            steps = steps + steps[:, ancestors[-1]]
+            ancestors.append(ancestors[-1][ancestors[-1]])
+
+        self.parent = parent
+        self.parent_edge = parent_edge
+        self.heights, self.lengths = steps[0], steps[1]
+        self.depth = np.rint(steps[2]).astype(np.intp)
+        self.ancestors = ancestors
+        tree_edges = np.zeros(count, dtype=bool)
+        tree_edges[child_edges] = True
+        # 不在生成树上的边，每条对应一个基本闭合环
+        self.closing_edges = np.flatnonzero(~tree_edges)
+
+    def _common_ancestors(self, first, second):
+        """批量求两组点在生成树上的最近公共祖先"""
+        first, second = first.copy(), second.copy()
+        swap = self.depth[first] < self.depth[second]
+        first[swap], second[swap] = second[swap], first[swap]
+        difference = self.depth[first] - self.depth[second]
+        for j, ancestors in enumerate(self.ancestors):
+            lift = (difference >> j) & 1 == 1
+            first[lift] = ancestors[first[lift]]
+        for ancestors in reversed(self.ancestors):
+            differ = ancestors[first] != ancestors[second]
+            first[differ] = ancestors[first[differ]]
+            second[differ] = ancestors[second[differ]]
+        return np.where(first == second, first, self.parent[first])
+
+    def loop_closures(self, tolerance_factor=40):
+        """
+        计算全部基本闭合环的闭合差
+        参数：
+            tolerance_factor (float): 限差系数，限差 = 系数 × √环长(km)，与往返不符值限差的系数相同
+        返回：
+            dict: 每个环一项的数组
+                edges: 闭合边（不在生成树上的边）在 observations 中的序号
+                misclosures: 闭合差(mm)，沿闭合边方向绕环一周的高差之和
+                lengths: 环长(m)
+                tolerances: 限差(mm)
+                exceeded: 闭合差是否超限
+        """
+        edges = self.closing_edges
+        starts, ends = self.starts[edges], self.ends[edges]
+        common = self._common_ancestors(starts, ends)
+        misclosures = (self.height_differences[edges] + self.heights[starts] - self.heights[ends]) * 1000
+        lengths = self.distances[edges] + self.lengths[starts] + self.lengths[ends] - 2 * self.lengths[common]
+        tolerances = tolerance_factor * np.sqrt(lengths / 1000)
+        return {
+            "edges": edges,
+            "misclosures": misclosures,
+            "lengths": lengths,
+            "tolerances": tolerances,
+            "exceeded": np.abs(misclosures) > tolerances,
+        }
+
+    def loop_edges(self, edge):
+        """
+        返回闭合边 edge 所在基本环的全部边，从闭合边开始沿闭合边方向排列
+        返回：
+            list: observations 中的序号
+        """
+        start, end = int(self.starts[edge]), int(self.ends[edge])
+        common = int(self._common_ancestors(np.array([start]), np.array([end]))[0])
+        parent, parent_edge = self.parent, self.parent_edge
+        to_common = []  # 从终点向上到公共祖先
+        node = end
+        while node != common:
+            to_common.append(int(parent_edge[node]))
+            node = parent[node]
+        from_common = []  # 从起点向上到公共祖先，绕环时反向经过
+        node = start
+        while node != common:
+            from_common.append(int(parent_edge[node]))
+            node = parent[node]
+        return [int(edge)] + to_common + from_common[::-1]
+
+    def loop_points(self, edge):
+        """返回闭合边 edge 所在基本环依次经过的点名，从闭合边的起点开始"""
+        points = [int(self.starts[edge])]
+        for loop_edge in self.loop_edges(edge):
+            start, end = int(self.starts[loop_edge]), int(self.ends[loop_edge])
+            points.append(end if start == points[-1] else start)
+        return [self.names[point] for point in points[:-1]]
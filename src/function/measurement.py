@@ -1,48 +1,23 @@
 import math
-import os
-import json
+
+import numpy as np
+
+from src.function.dms import dms_to_radians, dms_value_to_degrees
+from src.function.parameter_store import ParameterStore
 
 
 class Measurement:
     @staticmethod
     def load_parameters():
-        """加载计算参数"""
-        # 默认参数值
-        default_params = {
-            "h_a": 0.6,
-            "h_b": 0.6,
-            "k": 0.14,
-            "pc": -0.28,
-            "mc": -2.43,
-            "r": 6371000
-        }
-        
-        # 尝试从配置文件加载参数
-        config_dir = os.path.join(os.path.expanduser("~"), ".tl_tools")
-        config_file = os.path.join(config_dir, "parameters.json")
-        
-        # 如果配置文件不存在，使用默认值
-        if not os.path.exists(config_file):
-            return default_params
-        
-        try:
-            with open(config_file, 'r') as f:
-                params = json.load(f)
-                
-            # 确保所有必要的参数都存在
-            for key in default_params:
-                if key not in params:
-                    params[key] = default_params[key]
-                    
-            return params
-        except Exception:
-            return default_params
+        """加载计算参数（共享的参数存储，参数文件修改后才重新读取）"""
+        return ParameterStore().get()
 
     @staticmethod
     def calculate_all(s, z, i, l, t_a, t_b, p_a, p_b, h_a=None, h_b=None, k=None, pc=None, mc=None, r=None):
-        # 加载参数设置
-        params = Measurement.load_parameters()
-        
+        # 只有未提供全部参数时才加载参数设置（逐行计算时避免每行读取一次）
+        params = Measurement.load_parameters() if any(
+            value is None for value in (h_a, h_b, k, pc, mc, r)) else None
+
         # 如果未提供参数，使用加载的参数
         h_a = h_a if h_a is not None else params["h_a"]
         h_b = h_b if h_b is not None else params["h_b"]
@@ -69,11 +44,8 @@ class Measurement:
         # 加乘常数改正
         s_correction = mcd * (1 + mc * 10 ** (-6)) + pc / 1000
 
-        # 角度转换为十进制度
-        degrees = int(z)
-        minutes = int((z - degrees) * 100)
-        seconds = (((z - degrees) * 100) - minutes) * 100
-        decimal_degrees = degrees + minutes / 60 + seconds / 3600
+        # 角度转换为十进制度（按十进制数字精确拆分度、分、秒）
+        decimal_degrees = dms_value_to_degrees(z)
 
         # 斜距转换为水平距离
         d = s_correction * math.sin(decimal_degrees * (math.pi / 180))
@@ -82,9 +54,105 @@ class Measurement:
         height = (d / math.tan(decimal_degrees * (math.pi / 180)) + i - l +
                   (1 - k) * (d ** 2) / (2 * r))
 
+        # 保持完整精度，只在表格中显示时舍入
+        return {
+            "mcd": mcd,
+            "s_correction": s_correction,
+            "d": d,
+            "height": height
+        }
+
+    @staticmethod
+    def calculate_all_batch(s, z, i, l, t_a, t_b, p_a, p_b, h_a=None, h_b=None, k=None, pc=None, mc=None, r=None,
+                            z_radians=None):
+        """
+        calculate_all 的批量版本，一次计算整列观测
+        参数：
+            s, z, i, l, t_a, t_b, p_a, p_b: 等长的数组，天顶角 z 可以是 DDD.MMSS 格式的浮点数或原始文本
+            h_a, h_b, k, pc, mc, r: 标量或与观测等长的数组，未提供时使用参数设置
+            z_radians: 已解码的天顶角（弧度），提供时不再解码 z，用于重复计算时复用解码结果
+        返回：
+            dict: mcd、s_correction、d、height 四个 float64 数组（完整精度），与逐行调用 calculate_all 的结果在浮点误差范围内一致
+        """
+        # 只有未提供全部参数时才加载参数设置（多进程分片计算时参数已全部传入）
+        params = Measurement.load_parameters() if any(
+            value is None for value in (h_a, h_b, k, pc, mc, r)) else None
+
+        # 如果未提供参数，使用加载的参数
+        h_a = np.asarray(h_a if h_a is not None else params["h_a"], dtype=float)
+        h_b = np.asarray(h_b if h_b is not None else params["h_b"], dtype=float)
+        k = np.asarray(k if k is not None else params["k"], dtype=float)
+        pc = np.asarray(pc if pc is not None else params["pc"], dtype=float)
+        mc = np.asarray(mc if mc is not None else params["mc"], dtype=float)
+        r = np.asarray(r if r is not None else params["r"], dtype=float)
+        s, i, l, t_a, t_b, p_a, p_b = (np.asarray(v, dtype=float) for v in (s, i, l, t_a, t_b, p_a, p_b))
+
+        # 气象学改正
+        p = (p_a + p_b) / 2
+        t = (t_a + t_b) / 2
+        h = (h_a + h_b) / 2
+        x = 7.5 * t / (t + 237.3) + 0.7857
+        a = 1 / 273.15
+        dd = 286.34 - (0.29525 * p / (1 + a * t) - 4.126 * 10 ** (-4) * h / (1 + a * t) * np.power(10.0, x))
+        mcd = s * (1 + dd / 1000000)
+
+        # 加乘常数改正
+        s_correction = mcd * (1 + mc * 10 ** (-6)) + pc / 1000
+
+        # 角度转换为弧度（按十进制数字精确拆分度、分、秒）
+        radians = dms_to_radians(z) if z_radians is None else np.asarray(z_radians, dtype=float)
+
+        # 斜距转换为水平距离
+        d = s_correction * np.sin(radians)
+
+        # 计算最终高度
+        height = d / np.tan(radians) + i - l + (1 - k) * (d ** 2) / (2 * r)
+
+        return {
+            "mcd": mcd,
+            "s_correction": s_correction,
+            "d": d,
+            "height": height
+        }
+
+    @staticmethod
+    def calculate_pair(first_height, second_height, first_distance, second_distance, tolerance_factor=40):
+        """
+        计算一对往返观测的高差中数、往返不符值和限差
+        参数：
+            first_height, second_height: 往、返测高差(m)
+            first_distance, second_distance: 往、返测平距(m)
+            tolerance_factor: 限差系数，限差 = 系数 × √边长(km)
+        返回：
+            dict: average_d、sum_value、tolerance，保持完整精度
+        """
+        average_d = 0.5 * (first_height - second_height)
+        sum_value = (first_height + second_height) * 1000
+        tolerance = tolerance_factor * math.sqrt(0.5 * (abs(first_distance) + abs(second_distance)) / 1000)
+        return {
+            "average_d": average_d,
+            "sum_value": sum_value,
+            "tolerance": tolerance
+        }
+
+    @staticmethod
+    def calculate_pair_batch(first_heights, second_heights, first_distances, second_distances, tolerance_factor=40):
+        """
+        calculate_pair 的批量版本，一次计算多对往返观测
+        参数：
+            first_heights, second_heights: 往、返测高差数组(m)
+            first_distances, second_distances: 往、返测平距数组(m)
+            tolerance_factor: 限差系数
+        返回：
+            dict: average_d、sum_value、tolerance 三个列表，与逐对调用 calculate_pair 的结果一致
+        """
+        first_heights, second_heights, first_distances, second_distances = (
+            np.asarray(v, dtype=float) for v in (first_heights, second_heights, first_distances, second_distances))
+        average_d = 0.5 * (first_heights - second_heights)
+        sum_value = (first_heights + second_heights) * 1000
+        tolerance = tolerance_factor * np.sqrt(0.5 * (np.abs(first_distances) + np.abs(second_distances)) / 1000)
         return {
-            "mcd": round(mcd,5),
-            "s_correction": round(s_correction,5),
-            "d":  round(d,5),
-            "height": round(height,5)
+            "average_d": average_d.tolist(),
+            "sum_value": sum_value.tolist(),
+            "tolerance": tolerance.tolist()
         }
@@ -0,0 +1,102 @@
+import numpy as np
+
+from src.function.measurement import Measurement
+
+
+class PairCalculator:
+    """
+    往返观测计算的增量引擎
+
+    往返观测按配对索引（PairIndex）配对，与行在表格中的位置无关：一对的高差中数、往返不符值和限差
+    只依赖往测行和返测行当前选中的观测，结果显示在往测行。observations 记录每一行依赖的观测行号，
+    行的观测改变、行被移动或观测的计算结果变化后，只重新计算受影响的对。
+    """
+
+    def __init__(self, store, keys, observations, pair_index):
+        """
+        参数：
+            store (ObservationStore): 已写入计算结果的观测数据
+            keys (list): 每一行对应的分组键，顺序即表格中的行顺序
+            observations (np.ndarray): 每一行当前选中观测在 store 中的行号
+            pair_index (PairIndex): 往返观测配对索引
+        """
+        self.store = store
+        self.keys = list(keys)
+        self.observations = np.array(observations, dtype=np.intp)
+        self.pair_index = pair_index
+        self.rows = {key: row for row, key in enumerate(self.keys)}  # 分组键 -> 行号
+
+    def __len__(self):
+        return len(self.observations)
+
+    def set_observation(self, row, observation):
+        """切换某一行选中的观测，返回受影响的行"""
+        self.observations[row] = observation
+        return [row]
+
+    def move_row(self, from_row, to_row):
+        """
+        将一行移动到新位置，返回需要重新写入往返结果的行
+        配对与行顺序无关，只有被移动的行需要重新写入；两个位置之间的其他行只是整体平移
+        """
+        if from_row == to_row:
+            return []
+        observation = self.observations[from_row]
+        self.observations = np.insert(np.delete(self.observations, from_row), to_row, observation)
+        self.keys.insert(to_row, self.keys.pop(from_row))
+        for row in range(min(from_row, to_row), max(from_row, to_row) + 1):
+            self.rows[self.keys[row]] = row
+        return [to_row]
+
+    def partner_row(self, row):
+        """返回与该行配对的行号，未配对时为 None"""
+        partner = self.pair_index.partner(self.keys[row])
+        return None if partner is None else self.rows[partner]
+
+    def rows_depending_on(self, changed):
+        """
+        返回依赖于计算结果有变化的观测的行
+        参数：
+            changed (dict): DataService.calculate_results 返回的结果列变化标记
+        """
+        mask = changed["height"] | changed["d"]
+        return np.flatnonzero(mask[self.observations]).tolist()
+
+    def pair_ids(self, rows=None):
+        """返回包含指定行的各对的编号，rows 缺省时为全部对"""
+        if rows is None:
+            return list(range(len(self.pair_index)))
+        pair_id = self.pair_index.pair_id
+        return sorted({pair_id(self.keys[row]) for row in rows if 0 <= row < len(self)} - {None})
+
+    def calculate(self, rows=None, tolerance_factor=40):
+        """
+        重新计算包含指定行的各对
+        参数：
+            rows (iterable): 观测改变的行，缺省时重新计算全部对
+            tolerance_factor (float): 限差系数
+        返回：
+            tuple: (行号列表, 结果列表)。每对的结果为往测行的 (高差中数, 往返不符值, 限差)，
+                   返测行以及未配对的行结果为 None
+        """
+        rows = range(len(self)) if rows is None else rows
+        pair_ids = self.pair_ids(rows)
+        forward_rows = np.array([self.rows[self.pair_index.forward[pair_id]] for pair_id in pair_ids], dtype=np.intp)
+        backward_rows = np.array([self.rows[self.pair_index.backward[pair_id]] for pair_id in pair_ids],
+                                 dtype=np.intp)
+        first, second = self.observations[forward_rows], self.observations[backward_rows]
+        # 缺失的计算结果按 0 处理
+        height, distance = self.store.results["height"], self.store.results["d"]
+        pair = Measurement.calculate_pair_batch(
+            np.nan_to_num(height[first]), np.nan_to_num(height[second]),
+            np.nan_to_num(distance[first]), np.nan_to_num(distance[second]), tolerance_factor)
+
+        out_rows, out_results = [], []
+        for forward_row, backward_row, values in zip(forward_rows.tolist(), backward_rows.tolist(),
+                                                     zip(pair["average_d"], pair["sum_value"], pair["tolerance"])):
+            out_rows.extend((forward_row, backward_row))
+            out_results.extend((values, None))
+        unpaired = [row for row in rows if 0 <= row < len(self) and self.keys[row] not in self.pair_index]
+        out_rows.extend(unpaired)
+        out_results.extend([None] * len(unpaired))
+        return out_rows, out_results
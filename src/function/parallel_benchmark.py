@@ -0,0 +1,111 @@
+"""
+多进程分片计算的扩展性测试
+
+用法：
+    python -m src.function.parallel_benchmark [外业手簿匹配表.xlsx] [-n 观测数] [-w 最大进程数]
+
+不指定匹配表时生成模拟的测站网观测数据。依次用 1 ~ N 个进程分片计算（测量计算和往返计算），
+输出各进程数的耗时和加速比，并检查结果与单进程计算完全一致。
+"""
+import argparse
+import math
+import os
+import random
+import time
+
+import numpy as np
+
+from src.data.data_service import DataService
+from src.data.observation_store import ObservationStore, RESULT_COLUMNS
+from src.function.parallel_compute import compute_sharded
+
+
+def synthetic_rows(observations, seed=0, repeats=3):
+    """
+    生成模拟的外业手簿匹配表数据：测站沿测区随机分布，每条边往返各观测 1 ~ repeats 次
+    参数：
+        observations (int): 观测数
+        seed (int): 随机数种子
+        repeats (int): 每个方向的最多观测次数
+    返回：
+        list: 每行为 (文件名, 测站, 目标, 水平角, 天顶角, 斜距, 仪器高, 目标高, 测站温度, 目标温度, 测站气压, 目标气压)
+    """
+    rng = random.Random(seed)
+    point_count = max(observations // 20, 10)
+    points = [f"P{i:06d}" for i in range(point_count)]
+    heights = [rng.uniform(0, 500) for _ in points]
+    rows = []
+    while len(rows) < observations:
+        a = rng.randrange(point_count)
+        b = (a + rng.randint(1, 20)) % point_count
+        distance = rng.uniform(300, 1500)
+        for station, target in ((a, b), (b, a)):
+            for repeat in range(rng.randint(1, repeats)):
+                i, l = round(rng.uniform(1.2, 1.7), 3), round(rng.uniform(1.2, 1.7), 3)
+                dh = heights[target] - heights[station] + l - i + rng.gauss(0, 0.003)
+                zenith = math.degrees(math.atan2(distance, dh))
+                degrees = int(zenith)
+                minutes = int((zenith - degrees) * 60)
+                seconds = min(round(((zenith - degrees) * 60 - minutes) * 60, 1), 59.9)
+                rows.append((f"{points[station]}-{repeat}", points[station], points[target], 0.0,
+                             round(degrees + minutes / 100 + seconds / 10000, 5), math.hypot(distance, dh),
+                             i, l, 20.0, 20.5, 775.0, 776.0))
+    return rows[:observations]
+
+
+def _same(first, second):
+    """两个数组相等（NaN 视为相等）"""
+    return np.array_equal(first, second, equal_nan=True)
+
+
+def run_benchmark(store, max_workers, tolerance_factor=40):
+    """
+    依次用 1 ~ max_workers 个进程计算，返回 [(进程数, 耗时(s), 结果是否一致), ...]
+    """
+    data_service = DataService()
+    grouped_data = data_service.sort_and_calculate(data_service.group_data(store))
+    reference_results = {name: store.results[name].copy() for name in RESULT_COLUMNS}
+    reference_rows = data_service.calculate_pairs(grouped_data, tolerance_factor=tolerance_factor)
+    pair_index = grouped_data.pair_index()
+    positions = {key: position for position, key in enumerate(grouped_data.keys())}
+    reference_pairs = [tuple(reference_rows[positions[forward]][-3:]) for forward in pair_index.forward]
+
+    timings = []
+    for workers in range(1, max_workers + 1):
+        store.results = None
+        start = time.perf_counter()
+        pair_results = compute_sharded(grouped_data, workers, tolerance_factor)
+        elapsed = time.perf_counter() - start
+        same = (all(_same(store.results[name], reference_results[name]) for name in RESULT_COLUMNS)
+                and list(zip(pair_results["average_d"], pair_results["sum_value"],
+                             pair_results["tolerance"])) == reference_pairs)
+        timings.append((workers, elapsed, same))
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="多进程分片计算的扩展性测试")
+    parser.add_argument("input", nargs="?", help="外业手簿匹配表(.xlsx)，不指定时使用模拟数据")
+    parser.add_argument("-n", "--observations", type=int, default=500000, help="模拟数据的观测数")
+    parser.add_argument("-w", "--workers", type=int, default=os.cpu_count(), help="最大进程数")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        store = DataService().import_excel(args.input)
+    else:
+        store = ObservationStore.from_rows(synthetic_rows(args.observations))
+    print(f"观测数: {len(store)}，CPU 核数: {os.cpu_count()}")
+    print("进程数    耗时(s)    加速比    结果一致")
+    timings = run_benchmark(store, max(args.workers, 1))
+    baseline = timings[0][1]
+    for workers, elapsed, same in timings:
+        print(f"{workers:>6} {elapsed:>10.3f} {baseline / elapsed:>9.2f}    {'是' if same else '否'}")
+    return 0 if all(same for _, _, same in timings) else 1
+
+
+if __name__ == "__main__":
+    import multiprocessing
+    import sys
+
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,166 @@
+"""
+按测站分片的多进程计算
+
+往返观测对只涉及同一条边的两个分组，不同的对可以独立计算。这里先按测站图的连通部分
+（测站、目标互相连通的一组边）把全部往返观测对和未配对分组分成若干片，连通部分过大时
+再按往测测站分成连续的测站块，使各片的观测数大致相等；各片在进程池中分别完成
+测量计算和往返计算，结果按观测行号和对的编号写回，与单进程计算的结果和顺序完全一致。
+"""
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from src.function.logger import log_error
+from src.function.measurement import Measurement
+
+# 测量计算需要的原始数值列
+INPUT_COLUMNS = ("s", "z", "i", "l", "t_a", "t_b", "p_a", "p_b")
+# 参数设置中参与测量计算的参数
+MEASUREMENT_PARAMETERS = ("h_a", "h_b", "k", "pc", "mc", "r")
+# 观测数少于此值时进程启动和数据传输的开销超过计算本身，直接单进程计算
+MIN_PARALLEL_OBSERVATIONS = 200000
+
+
+def assign_shards(stations, targets, weights, shards):
+    """
+    将往返观测对和未配对分组分片
+    参数：
+        stations, targets (np.ndarray): 每个计算单元（一对往返观测或一个未配对分组）的测站、目标编码
+        weights (np.ndarray): 每个计算单元的观测数
+        shards (int): 分片数
+    返回：
+        np.ndarray: 每个计算单元所在的片号
+    """
+    import scipy.sparse as sp
+    from scipy.sparse.csgraph import connected_components
+
+    size = int(max(stations.max(), targets.max())) + 1
+    graph = sp.coo_matrix((np.ones(len(stations)), (stations, targets)), shape=(size, size))
+    _, labels = connected_components(graph, directed=False)
+    components = labels[stations]
+
+    # 过大的连通部分按测站排序后切成连续的测站块
+    target_weight = max(weights.sum() / shards, 1)
+    pieces = []
+    order = np.lexsort((stations, components))
+    bounds = np.flatnonzero(np.diff(components[order])) + 1
+    for members in np.split(order, bounds):
+        total = weights[members].sum()
+        if total <= target_weight:
+            pieces.append(members)
+            continue
+        cuts = np.searchsorted(np.cumsum(weights[members]), np.arange(target_weight, total, target_weight),
+                               side='right')
+        pieces.extend(piece for piece in np.split(members, cuts) if len(piece))
+
+    # 从大到小依次放入当前观测数最少的片
+    heap = [(0, shard) for shard in range(shards)]
+    assignment = np.empty(len(stations), dtype=np.intp)
+    for piece in sorted(pieces, key=lambda piece: -weights[piece].sum()):
+        load, shard = heapq.heappop(heap)
+        assignment[piece] = shard
+        heapq.heappush(heap, (load + int(weights[piece].sum()), shard))
+    return assignment
+
+
+def compute_shard(task):
+    """
+    计算一片观测（在子进程中运行）
+    参数：
+        task (dict): columns 为本片观测的原始数值列，params 为测量参数，
+                     pairs 为每对往测、返测观测在本片中的位置，tolerance_factor 为限差系数（为 None 时不计算往返结果）
+    返回：
+        dict: results 为测量计算结果，pair 为往返计算结果（高差中数、往返不符值、限差）
+    """
+    results = Measurement.calculate_all_batch(**task["columns"], **task["params"])
+    pair = None
+    if task["tolerance_factor"] is not None:
+        first, second = task["pairs"]
+        heights, distances = np.nan_to_num(results["height"]), np.nan_to_num(results["d"])
+        pair = Measurement.calculate_pair_batch(heights[first], heights[second], distances[first], distances[second],
+                                                task["tolerance_factor"])
+    return {"results": results, "pair": pair}
+
+
+def compute_sharded(grouped_data, workers, tolerance_factor=None, current_indices=None, params=None):
+    """
+    分片多进程计算全部观测，结果写入共享的 ObservationStore
+    参数：
+        grouped_data (GroupedObservations): 分组数据
+        workers (int): 进程数，为 1 时在当前进程中逐片计算
+        tolerance_factor (float): 限差系数，提供时同时计算往返结果
+        current_indices (dict): 分组键 -> 当前选中的观测序号，缺省时取每组第一条
+        params (dict): 计算参数，缺省时读取参数设置
+    返回：
+        dict: 提供 tolerance_factor 时为按对的编号排列的 average_d、sum_value、tolerance 三个列表，否则为 None
+    """
+    params = params or Measurement.load_parameters()
+    store, groups = grouped_data.store, grouped_data.groups
+    pair_index = grouped_data.pair_index()
+    pair_count = len(pair_index)
+    measurement_params = {name: params[name] for name in MEASUREMENT_PARAMETERS}
+
+    # 计算单元依次为各对往返观测和各未配对分组；keys 中第 p 对的往测、返测键位于 2p、2p+1
+    keys = [key for pair in pair_index.pairs() for key in pair] + pair_index.unpaired
+    if not keys:
+        return {"average_d": [], "sum_value": [], "tolerance": []} if tolerance_factor is not None else None
+    key_groups = [groups[key] for key in keys]
+    lengths = np.array([len(group) for group in key_groups], dtype=np.intp)
+    key_offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    indices = np.concatenate(key_groups).astype(np.intp)
+    unit_keys = np.concatenate((np.arange(0, 2 * pair_count, 2), np.arange(2 * pair_count, len(keys))))
+    unit_weights = np.add.reduceat(lengths, unit_keys)
+    first_observations = indices[key_offsets[unit_keys]]
+    unit_shards = assign_shards(store.station_codes[first_observations], store.target_codes[first_observations],
+                                unit_weights, max(int(workers), 1))
+
+    # 每条观测所在的片及其在片内的位置
+    key_shards = np.repeat(unit_shards, np.diff(np.append(unit_keys, len(keys))))
+    observation_shards = np.repeat(key_shards, lengths)
+    order = np.argsort(observation_shards, kind='stable')
+    shard_counts = np.bincount(observation_shards, minlength=unit_shards.max() + 1)
+    local_positions = np.empty(len(indices), dtype=np.intp)
+    local_positions[order] = np.arange(len(indices)) - np.repeat(np.cumsum(shard_counts) - shard_counts, shard_counts)
+
+    # 每对往测、返测当前选中的观测在片内的位置
+    current = np.zeros(len(keys), dtype=np.intp)
+    if current_indices:
+        current = np.array([current_indices.get(key, 0) for key in keys], dtype=np.intp)
+    first = local_positions[key_offsets[0:2 * pair_count:2] + current[0:2 * pair_count:2]]
+    second = local_positions[key_offsets[1:2 * pair_count:2] + current[1:2 * pair_count:2]]
+    pair_shards = unit_shards[:pair_count]
+
+    tasks, shard_indices, shard_pairs = [], [], []
+    for shard, shard_order in enumerate(np.split(order, np.cumsum(shard_counts)[:-1])):
+        if not len(shard_order):
+            continue
+        shard_rows = indices[shard_order]
+        pair_ids = np.flatnonzero(pair_shards == shard)
+        columns = {name: store.columns[name][shard_rows] for name in INPUT_COLUMNS}
+        tasks.append({"columns": columns, "params": measurement_params, "tolerance_factor": tolerance_factor,
+                      "pairs": (first[pair_ids], second[pair_ids])})
+        shard_indices.append(shard_rows)
+        shard_pairs.append(pair_ids)
+
+    outputs = None
+    if workers > 1 and len(tasks) > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+                outputs = list(executor.map(compute_shard, tasks))
+        except (OSError, BrokenProcessPool) as e:
+            # 进程池不可用时退回单进程计算
+            log_error(e, "多进程计算失败，改为单进程计算")
+    if outputs is None:
+        outputs = [compute_shard(task) for task in tasks]
+
+    pair_results = {name: np.empty(pair_count) for name in ("average_d", "sum_value", "tolerance")}
+    for shard_rows, pair_ids, output in zip(shard_indices, shard_pairs, outputs):
+        store.set_results(shard_rows, output["results"])
+        if output["pair"] is not None:
+            for name, values in pair_results.items():
+                values[pair_ids] = output["pair"][name]
+    if tolerance_factor is None:
+        return None
+    return {name: values.tolist() for name, values in pair_results.items()}
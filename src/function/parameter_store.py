@@ -0,0 +1,105 @@
+import json
+import os
+import threading
+
+from src.function.logger import log_error
+
+# 默认参数值
+DEFAULT_PARAMETERS = {
+    "h_a": 0.6,
+    "h_b": 0.6,
+    "k": 0.14,
+    "pc": -0.28,
+    "mc": -2.43,
+    "r": 6371000,
+    "tolerance_factor": 40
+}
+
+
+class ParameterStore:
+    """
+    计算参数的共享存储
+
+    参数文件只在首次使用或文件修改时间变化时重新读取；
+    通过 save 保存参数后通知所有订阅者。
+    """
+
+    _instance = None
+    _lock = threading.Lock()
+
+    def __new__(cls):
+        with cls._lock:
+            if cls._instance is None:
+                cls._instance = super().__new__(cls)
+            return cls._instance
+
+    def __init__(self):
+        if not hasattr(self, 'initialized'):
+            self.initialized = True
+            self.config_dir = os.path.join(os.path.expanduser("~"), ".tl_tools")
+            self.config_file = os.path.join(self.config_dir, "parameters.json")
+            self.load_error = None  # 最近一次加载失败的异常
+            self._params = None
+            self._mtime = None
+            self._listeners = []
+
+    def _file_mtime(self):
+        try:
+            return os.stat(self.config_file).st_mtime_ns
+        except OSError:
+            return None
+
+    def _load(self):
+        """读取参数文件，缺少的参数使用默认值"""
+        params = DEFAULT_PARAMETERS.copy()
+        self.load_error = None
+        if os.path.exists(self.config_file):
+            try:
+                with open(self.config_file, 'r') as f:
+                    loaded_params = json.load(f)
+                for key in DEFAULT_PARAMETERS:
+                    if key in loaded_params:
+                        params[key] = loaded_params[key]
+            except Exception as e:
+                self.load_error = e
+                log_error(e, "加载参数设置失败")
+        return params
+
+    def get(self):
+        """返回当前参数的副本，参数文件有修改时重新读取"""
+        with self._lock:
+            mtime = self._file_mtime()
+            if self._params is None or mtime != self._mtime:
+                self._params = self._load()
+                self._mtime = mtime
+            return self._params.copy()
+
+    def save(self, params):
+        """保存参数到配置文件并通知订阅者，先写临时文件再替换"""
+        with self._lock:
+            os.makedirs(self.config_dir, exist_ok=True)
+            temp_file = self.config_file + ".tmp"
+            try:
+                with open(temp_file, 'w') as f:
+                    json.dump(params, f, indent=4)
+                os.replace(temp_file, self.config_file)
+            except Exception:
+                if os.path.exists(temp_file):
+                    os.remove(temp_file)
+                raise
+            self._params = DEFAULT_PARAMETERS.copy()
+            self._params.update(params)
+            self._mtime = self._file_mtime()
+            new_params = self._params.copy()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(new_params)
+
+    def subscribe(self, listener):
+        """订阅参数变化，listener 接收新的参数字典"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
@@ -0,0 +1,52 @@
+"""
+后台任务
+
+耗时的导入、匹配和计算放到线程池中运行，界面线程只接收进度和结果信号，
+长时间导入时窗口仍可操作，并可以随时取消。
+"""
+import threading
+
+from PyQt6.QtCore import QObject, QRunnable, pyqtSignal
+
+from src.function.logger import log_error
+
+
+class WorkerSignals(QObject):
+    """后台任务的信号，由界面线程中的槽接收"""
+    progress = pyqtSignal(int, int, object)  # 已完成数, 总数（为 0 时进度未知）, 新增的部分结果
+    finished = pyqtSignal(object)  # 任务的返回值；取消时为已完成的部分结果
+    error = pyqtSignal(object)  # 任务抛出的异常
+
+
+class Worker(QRunnable):
+    """
+    在线程池中运行 fn(*args, progress=..., is_cancelled=..., **kwargs)
+
+    fn 通过 progress(已完成数, 总数, 部分结果) 报告进度，并定期调用 is_cancelled() 检查是否取消，
+    取消时应尽快返回已完成的部分结果。
+    """
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.signals = WorkerSignals()
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """请求取消任务，任务在下一次检查时停止"""
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        try:
+            result = self.fn(*self.args, progress=self.signals.progress.emit, is_cancelled=self.is_cancelled,
+                             **self.kwargs)
+        except Exception as e:
+            log_error(e, "后台任务失败")
+            self.signals.error.emit(e)
+            return
+        self.signals.finished.emit(result)
@@ -4,23 +4,78 @@
 # @Author: zuo
 import sys
 
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import QModelIndex, Qt
 from PyQt6.QtGui import QBrush, QColor, QPalette
-from PyQt6.QtWidgets import (QTableWidget, QTableWidgetItem, QApplication,
-                             QAbstractItemView, QHeaderView, QWidget,
-                             QPushButton, QLabel, QHBoxLayout)
+from PyQt6.QtWidgets import (QTableView, QApplication, QAbstractItemView, QHeaderView, QWidget,
+                             QLabel, QHBoxLayout, QStyledItemDelegate, QStyle, QStyleOptionButton)
+
+from src.widgets.matching_table_model import MatchingTableModel, CANDIDATE_ROLE
 
 # 定义颜色常量，方便后续维护和修改
 HIGHLIGHT_COLOR = QColor(254, 163, 86)
-DEFAULT_COLOR = QColor(255, 255, 255)
 
 # 文件名、目标列索引常量，避免硬编码
 FILE_COLUMN_INDEX = 1
 TARGET_COLUMN_INDEX = 2
 
 
-class DraggableTableWidget(QTableWidget):
-    def __init__(self, grouped_data, main_window, *args, **kwargs):
+class DragHighlightDelegate(QStyledItemDelegate):
+    """拖拽时用高亮色绘制鼠标所在的目标行，其余行使用模型提供的背景色"""
+
+    def initStyleOption(self, option, index):
+        super().initStyleOption(option, index)
+        if index.row() == self.parent().drop_row:
+            option.backgroundBrush = QBrush(HIGHLIGHT_COLOR)
+
+
+class NavigationDelegate(DragHighlightDelegate):
+    """
+    绘制导航按钮列：第 0 列为“<<”按钮和“k/n”观测序号，最后一列为“>>”按钮
+    按钮只是绘制出来的，点击由表格按位置判断（navigation_at），不为每一行创建控件
+    """
+    BUTTON_WIDTH = 36  # 第 0 列中按钮的宽度，其余部分显示观测序号
+
+    def __init__(self, direction, parent):
+        """
+        参数：
+            direction (str): 'previous' 或 'next'
+            parent (DraggableTableWidget): 所在的表格
+        """
+        super().__init__(parent)
+        self.direction = direction
+        self.text = '<<' if direction == 'previous' else '>>'
+
+    def button_rect(self, rect):
+        """单元格中按钮所占的区域"""
+        rect = rect.adjusted(2, 2, -2, -2)
+        if self.direction == 'previous':
+            rect.setWidth(min(self.BUTTON_WIDTH, rect.width()))
+        return rect
+
+    def paint(self, painter, option, index):
+        super().paint(painter, option, index)  # 背景、选中和拖拽高亮
+        position = index.data(CANDIDATE_ROLE)
+        if position is None:
+            return
+        view = self.parent()
+        button = QStyleOptionButton()
+        button.rect = self.button_rect(option.rect)
+        button.text = self.text
+        button.palette = option.palette
+        pressed = view.pressed_navigation == (index.row(), index.column())
+        button.state = QStyle.StateFlag.State_Enabled | (
+            QStyle.StateFlag.State_Sunken if pressed else QStyle.StateFlag.State_Raised)
+        painter.save()
+        view.style().drawControl(QStyle.ControlElement.CE_PushButton, button, painter, view)
+        if self.direction == 'previous':
+            painter.setPen(option.palette.color(QPalette.ColorRole.Text))
+            painter.drawText(option.rect.adjusted(button.rect.width() + 4, 0, 0, 0),
+                             Qt.AlignmentFlag.AlignCenter, f"{position[0]}/{position[1]}")
+        painter.restore()
+
+
+class DraggableTableWidget(QTableView):
+    def __init__(self, grouped_data, main_window, *args, current_indices=None, **kwargs):
         super().__init__(*args, **kwargs)
         self.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
 
@@ -31,14 +86,21 @@ class DraggableTableWidget(QTableWidget):
                           "测站温度(℃)", "目标温度(℃)", "测站气压(hPa)", "目标气压(hPa)", "气象改正(m)", "加乘常数改正(m)", "平距(m)", "高差(m)","高差中数(m)","往返不符值(mm)","限差(mm)","下一个"]
         self.drag_keys = ["文件名", "测站", "目标", "归零方向均值", "天顶角均值", "斜距(m)", "仪器高(m)", "目标高(m)",
                           "测站温度(℃)", "目标温度(℃)", "测站气压(hPa)", "目标气压(hPa)", "气象改正(m)", "加乘常数改正(m)", "平距(m)", "高差(m)","高差中数(m)","往返不符值(mm)","限差(mm)"]
-        self.setHorizontalHeaderLabels(self.data_keys)  # 设置表头
 
         self.grouped_data = grouped_data
-
         self.main_window = main_window
-        self.current_indices = {key: 0 for key in self.grouped_data}
+        # 行顺序、当前选中的观测和往返结果都保存在数据模型中，单元格文本在绘制时生成
+        self.table_model = MatchingTableModel(grouped_data, self.data_keys, current_indices, self)
+        self.setModel(self.table_model)
+        self.setItemDelegate(DragHighlightDelegate(self))
+        # 导航按钮由委托绘制，不为每一行创建按钮控件
+        self.setItemDelegateForColumn(0, NavigationDelegate('previous', self))
+        self.setItemDelegateForColumn(len(self.data_keys) - 1, NavigationDelegate('next', self))
+        self.pressed_navigation = None  # 按下的导航按钮 (行号, 列号)
+
         self.cur_key = None  # 当前拖拽的键
         self.drag_row = -1  # 拖拽行的标识
+        self.drop_row = -1  # 拖拽时鼠标所在的目标行，由委托绘制高亮
         self.drag_widget = None  # 拖拽的窗口组件
         self.init_drag_widget()  # 初始化拖拽窗口
         self.set_data()  # 初始化表格数据
@@ -59,10 +121,8 @@ class DraggableTableWidget(QTableWidget):
         p.setColor(QPalette.ColorRole.Window, QColor(0, 200, 100))
         return p
 
-    def set_drag_data_on_widget(self, row_data):
-        """设置拖拽窗口的数据，避免重复创建组件"""
-        if len(row_data) < len(self.drag_keys):
-            row_data = list(row_data) + [''] * (len(self.drag_keys) - len(row_data))
+    def set_drag_data_on_widget(self, row):
+        """设置拖拽窗口的数据（与表格中该行显示的文本相同），避免重复创建组件"""
         if self.drag_widget.layout() is None:
             drag_layout = QHBoxLayout(self.drag_widget)
             drag_layout.setContentsMargins(10, 0, 0, 0)
@@ -74,132 +134,192 @@ class DraggableTableWidget(QTableWidget):
                 drag_layout.addWidget(text_label)
             drag_layout.addStretch()
 
-        # 仅更新拖拽窗口的文本数据
-        for col, key in enumerate(self.drag_keys):
-            if col < len(row_data):
-                print(row_data[col])
-                self.labels[col].setText(str(row_data[col]))
-            else:
-                print(f"索引 {col} 超出范围，最大索引为 {len(row_data) - 1}")
+        # 仅更新拖拽窗口的文本数据，第 0 列为导航按钮
+        for col, label in enumerate(self.labels, start=1):
+            label.setText(self.table_model.cell_text(row, col) or '')
+
     def mouseMoveEvent(self, event) -> None:
         """处理拖拽时的移动事件"""
         if self.drag_row != -1:
             self.drag_widget.move(event.pos())  # 移动拖拽窗口
             self.drag_widget.show()  # 显示拖拽窗口
-            row = self.indexAt(event.pos()).row()  # 获取鼠标位置的行
-            self._highlight_row(row)  # 高亮当前行
+            self._set_drop_row(self.indexAt(event.pos()).row())  # 高亮鼠标所在的行
 
-    def _highlight_row(self, row):
-        """高亮指定行，恢复其他行的默认背景色"""
-        self.set_row_bg_color(row, HIGHLIGHT_COLOR)  # 高亮当前行
-        self.set_row_bg_color(row + 1, DEFAULT_COLOR)  # 恢复下一行
-        self.set_row_bg_color(row - 1, DEFAULT_COLOR)  # 恢复上一行
+    def _set_drop_row(self, row):
+        """更换高亮的目标行，只重绘原来和新的目标行"""
+        previous, self.drop_row = self.drop_row, row
+        if previous != row:
+            self._update_row(previous)
+            self._update_row(row)
 
-    def set_row_bg_color(self, row, color):
-        """设置指定行的背景颜色"""
+    def _update_row(self, row):
+        """重绘指定行的可见部分"""
         if row < 0:
             return
-        for col in range(self.columnCount()):
-            item = self.item(row, col)
-            if item:
-                item.setBackground(QBrush(color))
+        rect = self.visualRect(self.table_model.index(row, 0))
+        self.viewport().update(0, rect.top(), self.viewport().width(), rect.height())
+
+    def highlight_keys(self, keys):
+        """
+        标记闭合差超限的环经过的行，清除之前的标记
+        参数：
+            keys (iterable): 需要标记的分组键
+        """
+        self.table_model.set_flagged_keys(keys)
+
+    def navigation_at(self, pos):
+        """返回位置 pos 处的导航按钮 (行号, 列号)，不在按钮上时为 None"""
+        index = self.indexAt(pos)
+        if not index.isValid() or index.data(CANDIDATE_ROLE) is None:
+            return None
+        delegate = self.itemDelegateForIndex(index)
+        if not isinstance(delegate, NavigationDelegate):
+            return None
+        if not delegate.button_rect(self.visualRect(index)).contains(pos):
+            return None
+        return index.row(), index.column()
 
     def mousePressEvent(self, event) -> None:
-        """处理鼠标按下事件，开始拖拽"""
+        """处理鼠标按下事件：按下导航按钮，或在文件名列开始拖拽"""
+        pressed = self.navigation_at(event.pos())
+        if pressed is not None:
+            self.pressed_navigation = pressed
+            self.viewport().update(self.visualRect(self.table_model.index(*pressed)))
+            return
         row, col = self.get_row_col_from_event(event)
-        if col == FILE_COLUMN_INDEX:
-            cur_item = self.item(row, TARGET_COLUMN_INDEX)
-            if cur_item:
-                self.drag_row = row
-                self.cur_key = (cur_item.data(Qt.ItemDataRole.UserRole)[1], cur_item.data(Qt.ItemDataRole.UserRole)[2])
-
-                # 设置拖拽窗口的数据
-                self.set_drag_data_on_widget(self.grouped_data[self.cur_key][self.current_indices[self.cur_key]])
+        if col == FILE_COLUMN_INDEX and row >= 0:
+            self.drag_row = row
+            self.cur_key = self.keys[row]
+            self.set_drag_data_on_widget(row)  # 设置拖拽窗口的数据
         super().mousePressEvent(event)
 
     def get_row_col_from_event(self, event):
         """从事件中获取行和列"""
         return self.indexAt(event.pos()).row(), self.indexAt(event.pos()).column()
 
+    def mouseDoubleClickEvent(self, event) -> None:
+        """快速连续点击导航按钮时按两次点击处理"""
+        if self.navigation_at(event.pos()) is not None:
+            self.mousePressEvent(event)
+            return
+        super().mouseDoubleClickEvent(event)
+
     def mouseReleaseEvent(self, event) -> None:
-        """处理鼠标释放事件，完成拖拽并交换行"""
+        """处理鼠标释放事件：在按下的导航按钮上松开时切换观测，或完成拖拽并移动行"""
+        if self.pressed_navigation is not None:
+            pressed, self.pressed_navigation = self.pressed_navigation, None
+            self.viewport().update(self.visualRect(self.table_model.index(*pressed)))
+            if self.navigation_at(event.pos()) == pressed:
+                row, col = pressed
+                self.navigate_data(self.keys[row], row, 'previous' if col == 0 else 'next')
+            return
         row, col = self.get_row_col_from_event(event)
-        self._clear_row_highlight(row)  # 清除高亮
-
-        cur_item = self.item(row, TARGET_COLUMN_INDEX)
-        print(cur_item)
-
-        if cur_item and self.drag_row != -1:
-            self.move_row(self.drag_row, row)  # 移动行数据
-            self.update_table_row(row, self.cur_key)  # 更新表格数据
-            if len(self.grouped_data[self.cur_key]) > 1:
-                self._add_navigation_buttons(row, self.cur_key)
-            self.selectRow(row)
+        self._set_drop_row(-1)  # 清除高亮
 
+        if self.drag_row != -1:
+            if row >= 0:
+                self.move_row(self.drag_row, row)  # 移动行数据，往返结果随行移动
+                self.selectRow(row)
             self.init_drag_widget()  # 重置拖拽组件
             self.drag_row = -1
 
         super().mouseReleaseEvent(event)
 
     def move_row(self, from_row, to_row):
-        """将一行数据从一个位置移动到另一个位置"""
+        """通过数据模型的 moveRows 将一行移动到新位置，其他行只是整体平移"""
         if from_row == to_row:
-            return
-        self.removeRow(from_row)
-        self.insertRow(to_row)
-
-    def _clear_row_highlight(self, row):
-        """清除行高亮，恢复为默认背景色"""
-        self.set_row_bg_color(row, DEFAULT_COLOR)
-
-    def _add_navigation_buttons(self, row, key):
-        """为指定行添加导航按钮"""
-        last_column_index = self.columnCount()
-        prev_button = QPushButton('<<')
-        prev_button.clicked.connect(lambda _, k=key: self.navigate_data(k, self.currentRow(), 'previous'))
-        self.setCellWidget(row, 0, prev_button)
-
-        next_button = QPushButton('>>')
-        next_button.clicked.connect(lambda _, k=key: self.navigate_data(k, self.currentRow(), 'next'))
-        self.setCellWidget(row, last_column_index-1, next_button)
+            return False
+        destination = to_row + 1 if to_row > from_row else to_row
+        return self.table_model.moveRows(QModelIndex(), from_row, 1, QModelIndex(), destination)
 
     def set_data(self):
-        """设置表格的初始数据"""
-        self.setColumnCount(len(self.data_keys))
-        self.setHorizontalHeaderLabels(self.data_keys)
+        """设置表格的初始数据：单元格和导航按钮都由数据模型、委托提供，不需要逐行创建"""
         self.horizontalHeader().setSectionResizeMode(3, QHeaderView.ResizeMode.ResizeToContents)
 
-        for row, key in enumerate(self.grouped_data.keys()):
-            # print(f"Setting row {row} with data: {key}")
-            self.insertRow(row)
-            self.update_table_row(row, key)
-            if len(self.grouped_data[key]) > 1:
-                self._add_navigation_buttons(row, key)
+    @property
+    def keys(self):
+        """每一行对应的分组键，顺序即当前的行顺序"""
+        return self.table_model.keys
+
+    @property
+    def current_indices(self):
+        """分组键 -> 当前选中的观测序号"""
+        return self.table_model.current_indices
+
+    @property
+    def pair_calculator(self):
+        """往返观测计算的增量引擎，保存行顺序和每行当前选中的观测"""
+        return self.table_model.pair_calculator
+
+    @property
+    def flagged_keys(self):
+        """闭合差超限的环经过的分组键"""
+        return self.table_model.flagged_keys
+
+    @property
+    def pair_results(self):
+        """每一行显示的往返计算结果（高差中数、往返不符值、限差）"""
+        return self.table_model.pair_results
+
+    def partner_row(self, row):
+        """返回与该行配对的往返观测所在的行号，未配对时为 None"""
+        return self.pair_calculator.partner_row(row)
+
+    def row_keys(self):
+        """返回表格中每一行对应的分组键，顺序即当前的行顺序"""
+        return list(self.keys)
+
+    def current_observations(self):
+        """返回每一行当前选中观测在 ObservationStore 中的行号数组，顺序即当前的行顺序"""
+        return self.pair_calculator.observations
+
+    def refresh_results(self, changed=None):
+        """
+        计算结果更新后刷新每行的计算结果列（气象改正、加乘常数改正、平距、高差），
+        保持行顺序和当前选中的观测
+        参数：
+            changed (dict): 结果列名 -> 按观测行号标记数值是否变化的布尔数组，
+                            提供时只刷新变化的行，缺省时刷新全部行
+        """
+        if self.grouped_data.store.results is None:
+            return
+        self.table_model.refresh_results(changed)
+
+    def set_pair_results(self, results, rows=None):
+        """
+        设置高差中数、往返不符值和限差，只刷新数值有变化的行
+        参数：
+            results (list): 每行的三个计算结果（元组），为 None 时清空该行的结果
+            rows (list): results 对应的行号，缺省时为全部行
+        """
+        self.table_model.set_pair_results(results, rows)
 
     def navigate_data(self, key, row, direction):
-        """根据方向导航数据，支持前一条和后一条"""
+        """根据方向导航数据，支持前一条和后一条，只重新计算该行所在的往返观测对"""
+        if not 0 <= row < len(self.keys) or self.keys[row] != key:
+            row = self.pair_calculator.rows[key]  # 行号与分组键不一致时按键查找所在的行
         current_index = self.current_indices[key]
         if direction == 'previous':
-            self.current_indices[key] = (current_index - 1) % len(self.grouped_data[key])
+            index = (current_index - 1) % len(self.grouped_data[key])
         else:
-            self.current_indices[key] = (current_index + 1) % len(self.grouped_data[key])
-        self.update_table_row(row, key)
-        self.main_window.calculate_draggable_table_widget()
-        
-        # todo 自动计算
-
-    def update_table_row(self, row, key):
-        """更新指定行的数据"""
-        current_index = self.current_indices[key]
-        current_data = self.grouped_data[key][current_index]
-        # print(f"Updating row {row} with data: {current_data}")  # 调试输出
-        for col, value in enumerate(current_data):
-            item = self.item(row, col + 1)
-            if not item or item.text() != str(value):  # 只有在数据不同的时候才更新
-                item = QTableWidgetItem(str(value))
-                if col == FILE_COLUMN_INDEX:
-                    item.setData(Qt.ItemDataRole.UserRole, current_data)
-                self.setItem(row, col + 1, item)
+            index = (current_index + 1) % len(self.grouped_data[key])
+        affected_rows = self.table_model.set_current_index(row, index)
+        self.main_window.calculate_draggable_table_widget(rows=affected_rows)
+
+    def set_current_indices(self, current_indices):
+        """
+        批量切换各分组当前选中的观测，只更新有变化的行
+        参数：
+            current_indices (dict): 分组键 -> 观测序号
+        返回：
+            list: 观测有变化的行，用于重新计算往返结果
+        """
+        rows = []
+        for key, index in current_indices.items():
+            if self.current_indices.get(key) == index:
+                continue
+            rows.extend(self.table_model.set_current_index(self.pair_calculator.rows[key], index))
+        return rows
 
 
 
@@ -1,7 +1,5 @@
 from PyQt6.QtWidgets import QWidget, QVBoxLayout, QLabel, QPushButton, QFileDialog
 
-from src.data.data_oop import MeasurementData
-
 
 class ImportDataWindow(QWidget):
     def __init__(self, main_window):
@@ -32,9 +30,7 @@ class ImportDataWindow(QWidget):
         path = QFileDialog.getExistingDirectory(self, '选择文件夹')
         if path:
             self.main_window.showMaximized()
-            self.main_window.status_bar.showMessage(f"已加载数据: {path}")
-            # 调用主窗口的方法来创建并显示DraggableTableWidget
-            example = MeasurementData(path)
-            original_data = example.original_data
-            self.main_window.set_table_widget(original_data)
-            self.close()  # 关闭导入窗口
\ No newline at end of file
+            # 在后台多进程解析外业手簿（未修改的文件直接读取缓存），
+            # 解析过程中主窗口可以操作，已解析的观测逐批显示，可随时取消
+            self.main_window.import_directory(path)
+            self.close()  # 关闭导入窗口
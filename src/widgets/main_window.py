@@ -1,10 +1,7 @@
-import math
-import sys
 import os
-import json
+import sys
 from collections import defaultdict
 
-import openpyxl
 from PyQt6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -13,16 +10,25 @@ from PyQt6.QtWidgets import (
     QStatusBar,
     QMessageBox,
     QFileDialog,
-    QTableWidgetItem,
-    QTableWidget,
+    QTableView,
     QHeaderView,
+    QProgressBar,
+    QPushButton,
 )
+from PyQt6.QtCore import QThreadPool, QTimer
 from PyQt6.QtGui import QPalette, QColor
+from src.widgets.background_worker import Worker
 from src.widgets.draggable_table_widgets import DraggableTableWidget
 from src.widgets.import_data_widgets import ImportDataWindow
 from src.widgets.menu_component import MenuComponent
+from src.widgets.observation_table_model import ObservationTableModel
 from src.widgets.parameter_window import ParameterWindow
 from src.data.data_service import DataService
+from src.data.observation_store import ObservationStore
+from src.data.project_file import save_project, load_project
+from src.function.logger import log_error
+from src.function.parameter_store import ParameterStore
+from src.data.ingest_cache import IngestCache
 
 
 class MainWindow(QMainWindow):
@@ -44,36 +50,56 @@ class MainWindow(QMainWindow):
         # 创建状态栏
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
+        self.init_task_widgets()
 
         # 创建菜单栏
         self.menu_component = MenuComponent(self)
         self.setMenuBar(self.menu_component)  # 使用 setMenuBar 设置菜单
         self.initFileMenu()
 
-        # 创建中心部件和布局
-        self.central_widget = QWidget()
-        self.setCentralWidget(self.central_widget)
-        self.layout = QVBoxLayout(self.central_widget)
-
         # 添加导入数据窗口
         self.grouped_data = defaultdict(list)
         self.import_data_window = ImportDataWindow(self)
         # self.import_data_window.show()
 
-        # Create a table widget
-        self.table_widget = QTableWidget()
+        # 导入数据表格：数据模型直接读取观测数据，只显示可见的单元格
         self.data_keys = ["文件名", "测站", "目标", "归零方向均值", "天顶角均值", "斜距", "仪器高(m)", "目标高(m)",
                           "测站温度", "目标温度", "测站气压", "目标气压"]
-        self.table_widget.setColumnCount(len(self.data_keys))
-        self.table_widget.setHorizontalHeaderLabels(self.data_keys)
-        self.layout.addWidget(self.table_widget)
-        self.table_widget.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        self.table_model = ObservationTableModel(self.data_keys, parent=self)
+        self.init_import_table()
 
-        self.data = []
+        self.data = ObservationStore()
         self.data_service = DataService()
         
-        # 加载参数设置
+        # 加载参数设置，并在参数保存后收到通知
         self.load_parameters()
+        listener = self.on_parameters_changed
+        ParameterStore().subscribe(listener)
+        # 窗口对象销毁时取消订阅，共享的参数存储不再回调已删除的界面对象
+        self.destroyed.connect(lambda: ParameterStore().unsubscribe(listener))
+
+    def init_task_widgets(self):
+        """状态栏中的后台任务进度条和取消按钮，只在任务运行时显示"""
+        self.task = None  # 正在运行的后台任务（Worker）
+        self.task_message = ""
+        self.task_finished = None
+        self.task_partial = None
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(240)
+        self.progress_bar.hide()
+        self.cancel_button = QPushButton("取消")
+        self.cancel_button.setStyleSheet("padding: 2px 12px;")
+        self.cancel_button.clicked.connect(self.cancel_task)
+        self.cancel_button.hide()
+        self.status_bar.addPermanentWidget(self.progress_bar)
+        self.status_bar.addPermanentWidget(self.cancel_button)
+        # 边解析边显示：新解析的观测先暂存，定时批量追加到导入数据表格
+        self.pending_rows = []
+        self.partial_timer = QTimer(self)
+        self.partial_timer.setSingleShot(True)
+        self.partial_timer.setInterval(200)
+        self.partial_timer.timeout.connect(self._flush_observations)
+        QApplication.instance().aboutToQuit.connect(self.stop_tasks)
 
     def setup_styles(self):
             """设置全局样式"""
@@ -177,6 +203,8 @@ class MainWindow(QMainWindow):
     def initFileMenu(self):
         file_menu = self.menu_component.add_menu('文件')
         self.menu_component.add_action(file_menu, '打开', '打开文件夹', self.openFile)
+        self.menu_component.add_action(file_menu, '打开项目', '打开项目文件', self.openProject)
+        self.menu_component.add_action(file_menu, '保存项目', '保存项目文件', self.saveProject)
         self.menu_component.add_action(file_menu, '退出', '退出程序', self.close)
 
         import_menu = self.menu_component.add_menu('导入')
@@ -190,10 +218,19 @@ class MainWindow(QMainWindow):
 
         measure_menu = self.menu_component.add_menu('处理')
         self.menu_component.add_action(measure_menu, '匹配外业手簿', '匹配', self.set_draggable_table_widget)
-        self.menu_component.add_action(measure_menu, '计算对象观测中误差', '对象观测计算', self.calculate_draggable_table_widget)
+        # 菜单触发时会传入 checked 参数，这里不传 rows，重新计算全部对
+        self.menu_component.add_action(measure_menu, '计算对象观测中误差', '对象观测计算',
+                                       lambda: self.calculate_draggable_table_widget())
+        self.menu_component.add_action(measure_menu, '自动选择最优组合', '为每对往返观测选择往返不符值最小的观测组合',
+                                       self.select_best_combinations)
+        self.menu_component.add_action(measure_menu, '高程网平差', '按往返观测高差中数进行高程网平差',
+                                       self.adjust_height_network)
+        self.menu_component.add_action(measure_menu, '闭合环检核', '计算基本闭合环的闭合差并标记超限的行',
+                                       self.check_loop_closures)
 
         measure_menu = self.menu_component.add_menu('设置')
         self.menu_component.add_action(measure_menu, '参数设置', '参数设置', self.set_parameter)
+        self.menu_component.add_action(measure_menu, '清除解析缓存', '清除外业手簿解析缓存', self.clear_ingest_cache)
 
         help_menu = self.menu_component.add_menu('帮助')
         self.menu_component.add_action(help_menu, '关于', '关于程序', self.showAbout)
@@ -212,31 +249,151 @@ class MainWindow(QMainWindow):
             file_dialog_result = QFileDialog.getOpenFileName(self, '选择文件', '', 'Excel Files (*.xlsx)')
             file_path = file_dialog_result[0]
             if file_path:
-                data = self.data_service.import_excel(file_path)
-                self.data = data
-                self.set_table_widget(data)
+                # 在后台读取匹配表，读取过程中窗口可以操作
+                worker = Worker(self.data_service.import_excel, file_path)
+                self.start_task(worker, f"正在导入匹配表: {file_path}", self._matching_table_imported)
             else:
                 QMessageBox.warning(self, '错误', '没有选择文件')
         except AttributeError:
             QMessageBox.warning(self, '错误', '没有可导入的数据')
 
-    def set_table_widget(self, data):
-        # 清空现有表格内容
-        self.table_widget.clear()
-
-        # 设置行数
-        self.table_widget.setRowCount(len(data))
-
-        # 设置列数
-        self.table_widget.setColumnCount(len(self.data_keys))
-
-        # 重新设置表头
-        self.table_widget.setHorizontalHeaderLabels(self.data_keys)
+    def _matching_table_imported(self, data, cancelled):
+        self.set_table_widget(data)
+        if cancelled:
+            self.status_bar.showMessage(f"已取消导入匹配表，已读取 {len(data)} 条观测")
+        else:
+            self.status_bar.showMessage(f"已导入匹配表，共 {len(data)} 条观测")
+
+    def import_directory(self, path):
+        """
+        在后台解析目录中的外业手簿：多进程并行解析，未修改的文件直接读取缓存，
+        已解析的观测按文件顺序逐批显示在导入数据表格中
+        """
+        from src.data.data_oop import MeasurementData
+
+        worker = Worker(MeasurementData, path, workers=os.cpu_count(), cache=IngestCache())
+        if self.start_task(worker, f"正在解析外业手簿: {path}", self._directory_imported, self._append_observations):
+            self.pending_rows = []
+            self.set_table_widget(ObservationStore())
+
+    def _append_observations(self, rows):
+        """暂存新解析的观测，稍后批量追加到导入数据表格"""
+        self.pending_rows.extend(rows)
+        if not self.partial_timer.isActive():
+            self.partial_timer.start()
+
+    def _flush_observations(self):
+        rows, self.pending_rows = self.pending_rows, []
+        if rows:
+            self.table_model.append_store(ObservationStore.from_rows(rows))
+
+    def _directory_imported(self, example, cancelled):
+        # 最终结果与已逐批显示的观测顺序一致，直接换成解析得到的观测数据
+        self.partial_timer.stop()
+        self.pending_rows = []
+        self.set_table_widget(example.observations)
+        if cancelled:
+            self.status_bar.showMessage(f"已取消导入，已加载 {len(example.original_list)} 个文件: {example.path}")
+        else:
+            self.status_bar.showMessage(f"已加载数据: {example.path}")
+
+    def start_task(self, worker, message, on_finished, on_partial=None):
+        """
+        在线程池中运行后台任务，状态栏显示进度和取消按钮；同一时间只运行一个任务
+        参数：
+            worker (Worker): 后台任务
+            message (str): 状态栏中显示的任务说明
+            on_finished (callable): 任务结束后在界面线程中调用 on_finished(返回值, 是否已取消)
+            on_partial (callable): 收到部分结果时在界面线程中调用 on_partial(部分结果)
+        返回：
+            bool: 是否已开始运行
+        """
+        if self.task_running():
+            return False
+        self.task = worker
+        self.task_message = message
+        self.task_finished = on_finished
+        self.task_partial = on_partial
+        worker.signals.progress.connect(self._task_progress)
+        worker.signals.finished.connect(self._task_finished)
+        worker.signals.error.connect(self._task_error)
+        self.progress_bar.setRange(0, 0)  # 收到第一次进度之前显示忙碌状态
+        self.progress_bar.show()
+        self.cancel_button.setEnabled(True)
+        self.cancel_button.show()
+        self.status_bar.showMessage(message)
+        QThreadPool.globalInstance().start(worker)
+        return True
+
+    def task_running(self):
+        """有后台任务正在运行时提示并返回 True"""
+        if self.task is None:
+            return False
+        QMessageBox.warning(self, '错误', '正在处理数据，请等待完成或取消后再试')
+        return True
+
+    def cancel_task(self):
+        """请求取消正在运行的后台任务，已完成的部分结果仍会显示"""
+        if self.task is not None and not self.task.is_cancelled():
+            self.task.cancel()
+            self.cancel_button.setEnabled(False)
+            self.status_bar.showMessage(f"{self.task_message}（正在取消…）")
+
+    def stop_tasks(self):
+        """程序退出时取消后台任务，并等待线程池中的任务结束"""
+        self.cancel_task()
+        QThreadPool.globalInstance().waitForDone()
+
+    def _task_progress(self, done, total, partial):
+        self.progress_bar.setRange(0, total)  # 总数为 0 时显示忙碌状态
+        self.progress_bar.setValue(done)
+        if total and not self.task.is_cancelled():
+            self.status_bar.showMessage(f"{self.task_message}（{done}/{total}）")
+        if partial and self.task_partial is not None:
+            self.task_partial(partial)
+
+    def _end_task(self):
+        worker, self.task = self.task, None
+        self.progress_bar.hide()
+        self.cancel_button.hide()
+        return worker
+
+    def _task_finished(self, result):
+        worker = self._end_task()
+        self.task_finished(result, worker.is_cancelled())
+
+    def _task_error(self, error):
+        self._end_task()
+        self.partial_timer.stop()
+        self.pending_rows = []
+        self.status_bar.clearMessage()
+        QMessageBox.warning(self, '错误', f"{self.task_message}失败: {str(error)}")
+
+    def init_import_table(self):
+        """创建导入数据表格（QTableView）作为中央组件"""
+        self.central_widget = QWidget()
+        self.setCentralWidget(self.central_widget)
+        self.layout = QVBoxLayout(self.central_widget)
+        self.table_widget = QTableView()
+        self.table_widget.setModel(self.table_model)
+        self.layout.addWidget(self.table_widget)
+        self.table_widget.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
 
-        # 设置表格数据
-        for row_idx, row_data in enumerate(data):
-            for col_idx, cell_data in enumerate(row_data):
-                self.table_widget.setItem(row_idx, col_idx, QTableWidgetItem(str(cell_data)))
+    def set_table_widget(self, data):
+        """
+        在导入数据表格中显示观测数据
+        参数：
+            data (ObservationStore): 导入的观测数据
+        """
+        # 导入的数据同时作为导出、匹配的数据来源；重新显示导入数据表格后需要重新匹配、计算
+        self.data = data
+        self.matched = False
+        self.calculated = False
+        self.grouped_data = defaultdict(list)
+        # 当前显示的是匹配表格时（例如打开未匹配的项目）换回导入数据表格
+        if self.table_widget.model() is not self.table_model:
+            self.init_import_table()
+        self.table_model.set_store(data)
 
     def exportOutsideTable(self):
         # 导出匹配表
@@ -258,76 +415,237 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, '错误', '没有可导出的数据')
 
     def get_all_table_data(self):
-        data = []
-        for row in range(self.table_widget.rowCount()):
-            if self.matched:
-                row_data = [self.table_widget.item(row, col).text() if self.table_widget.item(row, col) else None for col in range(self.table_widget.columnCount())[1:-1]]
-            else:
-                row_data = [self.table_widget.item(row, col).text() if self.table_widget.item(row, col) else None for col in range(self.table_widget.columnCount())]
-            data.append(row_data)
-        return data
+        """
+        导出用的表格数据，直接从数据层按当前行顺序取数值（完整精度），不读取单元格文本
+        返回：
+            list: 匹配后为每行当前选中的观测及往返计算结果，未匹配时为导入的原始数据
+        """
+        if self.matched:
+            table = self.table_widget
+            tolerance_factor = self.params.get("tolerance_factor", 40)
+            return self.data_service.calculate_pairs(self.grouped_data.reorder(table.row_keys()),
+                                                     table.current_indices, tolerance_factor)
+        return self.data.rows(range(len(self.data)))
 
     def set_draggable_table_widget(self):
         if self.matched:
             QMessageBox.warning(self, '错误', '已匹配，无法重复匹配')
         else:
-            self.grouped_data = self.data_service.group_data(self.data)
-            self.matched = True
-            self.grouped_data = self.data_service.sort_and_calculate(self.grouped_data)
-            self.table_widget.clear()
-
-            self.table_widget = DraggableTableWidget(self.grouped_data,self)
-            central_widget = QWidget()
-            layout = QVBoxLayout()
-            layout.addWidget(self.table_widget)
-            central_widget.setLayout(layout)
-
-            # 将 central_widget 作为主窗口的中央组件
-            self.setCentralWidget(central_widget)
-            self.calculated = True
-            self.calculate_draggable_table_widget()
-
-    def calculate_draggable_table_widget(self):
+            # 分组和计算在后台运行，观测较多时按测站分片多进程计算
+            worker = Worker(self.data_service.match_and_calculate, self.data, workers=os.cpu_count())
+            self.start_task(worker, "正在匹配并计算", self._matching_calculated)
+
+    def _matching_calculated(self, grouped_data, cancelled):
+        if grouped_data is None:
+            self.status_bar.showMessage("已取消匹配")
+            return
+        self.grouped_data = grouped_data
+        self.show_draggable_table_widget(grouped_data)
+        self.status_bar.showMessage(f"已匹配 {len(grouped_data)} 组观测")
+
+    def show_draggable_table_widget(self, grouped_data, current_indices=None):
+        """用分组数据创建匹配表格并显示为中央组件"""
+        self.matched = True
+        self.table_model.set_store(None)  # 匹配后不再显示导入数据表格，清空其数据模型
+
+        self.table_widget = DraggableTableWidget(grouped_data, self, current_indices=current_indices)
+        central_widget = QWidget()
+        layout = QVBoxLayout()
+        layout.addWidget(self.table_widget)
+        central_widget.setLayout(layout)
+
+        # 将 central_widget 作为主窗口的中央组件
+        self.setCentralWidget(central_widget)
+        self.calculated = True
+        self.calculate_draggable_table_widget()
+
+    def saveProject(self):
+        """保存项目：观测数据、匹配结果、行顺序和当前选中的观测"""
+        if len(self.data) == 0:
+            QMessageBox.warning(self, '错误', '没有可保存的数据')
+            return
+        file_path = QFileDialog.getSaveFileName(self, '保存项目', '', '三角高程项目 (*.tlp)')[0]
+        if not file_path:
+            return
+        try:
+            # 先把内存映射的列复制到内存，表格模型改用新的列数组，才能覆盖当前打开的项目文件
+            self.data.detach()
+            self.table_model.refresh_columns()
+            if self.matched:
+                self.table_widget.table_model.refresh_columns()
+                save_project(file_path, self.data, self.grouped_data,
+                             row_keys=self.table_widget.row_keys(),
+                             current_indices=self.table_widget.current_indices)
+            else:
+                save_project(file_path, self.data)
+            self.status_bar.showMessage(f"项目已保存: {file_path}")
+        except Exception as e:
+            log_error(e, "保存项目失败")
+            QMessageBox.warning(self, '错误', f"保存项目失败: {str(e)}")
+
+    def openProject(self):
+        """打开项目文件，恢复到保存时的状态"""
+        if self.task_running():
+            return
+        file_path = QFileDialog.getOpenFileName(self, '打开项目', '', '三角高程项目 (*.tlp)')[0]
+        if not file_path:
+            return
+        try:
+            project = load_project(file_path)
+        except Exception as e:
+            log_error(e, "打开项目失败")
+            QMessageBox.warning(self, '错误', f"打开项目失败: {str(e)}")
+            return
+        self.data = project["store"]
+        if project["grouped_data"] is not None:
+            # 按保存时的行顺序排列分组
+            self.grouped_data = project["grouped_data"].reorder(project["row_keys"])
+            self.show_draggable_table_widget(self.grouped_data, project["current_indices"])
+        else:
+            self.set_table_widget(self.data)
+        self.status_bar.showMessage(f"已打开项目: {file_path}")
+
+    def calculate_draggable_table_widget(self, rows=None):
         '''
         计算对象观测中误差
-        1. 获取当前行和下一行的第六列和第十四列数据
-        2. 计算平均值、和与容差
-        3. 将结果追加到当前行的指定列
-        4. 更新表格
+        1. 按配对索引找到每对往返观测所在的行（与行顺序无关），取两行当前选中观测的平距和高差
+           （直接读取计算结果，不解析单元格文本）
+        2. 计算高差中数、往返不符值与限差
+        3. 将结果写入每对的往测行，只修改有变化的单元格
+        参数：
+            rows (list): 观测改变的行，只重新计算包含这些行的对；缺省时重新计算全部对
         '''
         if self.matched:
-            for i in range(0, self.table_widget.rowCount(), 2):  # 每两行遍历
-                if i + 1 >= self.table_widget.rowCount():  # 确保有下一行
-                    continue
-
-                # 获取当前行和下一行的第六列和第十四列数据
-                def get_row_value(row, col):
-                    item = self.table_widget.item(row, col)
-                    return float(item.text()) if item else 0
-
-                first_row_value = get_row_value(i, 16)
-                second_row_value = get_row_value(i + 1, 16)
-                first_row_value_1 = get_row_value(i, 15)
-                second_row_value_1 = get_row_value(i + 1, 15)
-
-                # 计算平均值、和与容差
-                average_d = round(0.5 * (first_row_value - second_row_value), 5)
-                sum_value = round((first_row_value + second_row_value) * 1000, 5)
-                
-                # 使用参数设置中的tolerance_factor而不是硬编码的40
-                tolerance_factor = self.params.get("tolerance_factor", 40)  # 如果没有该参数，使用默认值40
-                tolerance = round(tolerance_factor * math.sqrt(0.5 * (abs(first_row_value_1) + abs(second_row_value_1)) / 1000), 5)
-
-                # 将结果追加到当前行的指定列
-                self.table_widget.setItem(i, self.table_widget.columnCount() - 4, QTableWidgetItem(str(average_d)))
-                self.table_widget.setItem(i, self.table_widget.columnCount() - 3, QTableWidgetItem(str(sum_value)))
-                self.table_widget.setItem(i, self.table_widget.columnCount() - 2, QTableWidgetItem(str(tolerance)))
-
+            table = self.table_widget
+            # 使用参数设置中的tolerance_factor而不是硬编码的40
+            tolerance_factor = self.params.get("tolerance_factor", 40)  # 如果没有该参数，使用默认值40
+            pair_rows, pair_results = table.pair_calculator.calculate(rows, tolerance_factor)
+            table.set_pair_results(pair_results, pair_rows)
 
         else:
             QMessageBox.warning(self, '错误', "没有可计算的数据")
             # 可以在这里显示结果，例如通过弹窗或更新表格
 
+    def select_best_combinations(self):
+        '''
+        自动选择最优组合
+        1. 对每对往返观测计算全部 往测 × 返测 观测组合的往返不符值
+        2. 每对选择不超限且往返不符值绝对值最小的组合（都超限时选择绝对值最小的组合）
+        3. 切换表格中选中的观测，只重新计算有变化的对
+        '''
+        if not self.matched:
+            QMessageBox.warning(self, '错误', "没有可计算的数据")
+            return
+        from src.function.combination_optimizer import best_current_indices
+
+        table = self.table_widget
+        current_indices, exceeded_count = best_current_indices(self.grouped_data, self.params.get("tolerance_factor", 40))
+        rows = table.set_current_indices(current_indices)
+        if rows:
+            self.calculate_draggable_table_widget(rows=rows)
+        pair_count = len(self.grouped_data.pair_index())
+        self.status_bar.showMessage(f"已为 {pair_count} 对往返观测选择最优组合，切换 {len(rows)} 行，"
+                                    f"仍超限 {exceeded_count} 对")
+
+    def adjust_height_network(self):
+        '''
+        高程网平差
+        1. 按匹配表当前的行顺序和选中的观测取每对往返观测的高差中数
+        2. 选择已知点高程文件，进行间接平差
+        3. 导出平差高程、改正数和精度评定
+        '''
+        if not self.matched:
+            QMessageBox.warning(self, '错误', "没有可平差的数据，请先匹配外业手簿")
+            return
+        fixed_file = QFileDialog.getOpenFileName(self, '选择已知点高程文件', '',
+                                                 '已知点高程 (*.xlsx *.txt *.csv *.dat)')[0]
+        if not fixed_file:
+            return
+        try:
+            from src.function.adjustment import adjust_height_network
+
+            fixed_heights = self.data_service.read_fixed_heights(fixed_file)
+            grouped_data = self.grouped_data.reorder(self.table_widget.row_keys())
+            observations = self.data_service.reciprocal_height_differences(
+                grouped_data, self.table_widget.current_indices)
+            result = adjust_height_network(observations, fixed_heights)
+        except Exception as e:
+            log_error(e, "高程网平差失败")
+            QMessageBox.warning(self, '错误', f"高程网平差失败: {str(e)}")
+            return
+
+        file_path = QFileDialog.getSaveFileName(self, '保存平差结果', '', 'Excel Files (*.xlsx)')[0]
+        if not file_path:
+            return
+        try:
+            self.data_service.export_adjustment(observations, result, fixed_heights, file_path)
+        except Exception as e:
+            log_error(e, "导出平差结果失败")
+            QMessageBox.warning(self, '错误', f"导出平差结果失败: {str(e)}")
+            return
+        QMessageBox.information(
+            self, '完成',
+            f"平差完成：{len(observations)} 条观测，{len(result['heights'])} 个点，多余观测数 {result['dof']}，"
+            f"单位权中误差 {result['sigma0']:.2f} mm/√km\n结果已保存到: {file_path}")
+
+    def check_loop_closures(self):
+        '''
+        闭合环检核
+        1. 按匹配表当前的行顺序和选中的观测取每对往返观测的高差中数，组成测站图
+        2. 计算全部基本闭合环的闭合差，限差 = 限差系数 × √环长(km)
+        3. 标记超限的环经过的行，并可导出全部闭合环
+        '''
+        if not self.matched:
+            QMessageBox.warning(self, '错误', "没有可检核的数据，请先匹配外业手簿")
+            return
+        try:
+            from src.function.loop_closure import StationGraph
+
+            table = self.table_widget
+            grouped_data = self.grouped_data.reorder(table.row_keys())
+            observations = self.data_service.reciprocal_height_differences(grouped_data, table.current_indices)
+            graph = StationGraph(observations)
+            closures = graph.loop_closures(self.params.get("tolerance_factor", 40))
+        except Exception as e:
+            log_error(e, "闭合环检核失败")
+            QMessageBox.warning(self, '错误', f"闭合环检核失败: {str(e)}")
+            return
+
+        flagged_keys = set()
+        for edge in closures["edges"][closures["exceeded"]].tolist():
+            for loop_edge in graph.loop_edges(edge):
+                start, end = observations[loop_edge][:2]
+                flagged_keys.update(((start, end), (end, start)))
+        table.highlight_keys(flagged_keys)
+
+        loop_count, exceeded_count = len(closures["edges"]), int(closures["exceeded"].sum())
+        if not loop_count:
+            QMessageBox.information(self, '完成', "往返观测没有组成闭合环")
+            return
+        self.status_bar.showMessage(f"闭合环检核：{loop_count} 个闭合环，超限 {exceeded_count} 个")
+        answer = QMessageBox.question(
+            self, '完成',
+            f"共 {loop_count} 个闭合环，闭合差超限 {exceeded_count} 个，超限环经过的行已标记。\n是否导出闭合环闭合差？")
+        if answer != QMessageBox.StandardButton.Yes:
+            return
+        file_path = QFileDialog.getSaveFileName(self, '保存闭合环闭合差', '', 'Excel Files (*.xlsx)')[0]
+        if not file_path:
+            return
+        try:
+            self.data_service.export_loop_closures(graph, closures, file_path)
+        except Exception as e:
+            log_error(e, "导出闭合环闭合差失败")
+            QMessageBox.warning(self, '错误', f"导出闭合环闭合差失败: {str(e)}")
+            return
+        self.status_bar.showMessage(f"闭合环闭合差已保存到: {file_path}")
+
+    def clear_ingest_cache(self):
+        try:
+            IngestCache().clear()
+            QMessageBox.information(self, "完成", "解析缓存已清除，下次导入将重新解析全部外业手簿。")
+        except Exception as e:
+            QMessageBox.warning(self, '错误', f"清除缓存失败: {str(e)}")
+
     def showAbout(self):
         QMessageBox.about(self, "关于", "这是一个程序")
     
@@ -335,44 +653,38 @@ class MainWindow(QMainWindow):
         parameter_window = ParameterWindow(self)
         result = parameter_window.exec()
         
-        # 如果用户确认了设置，则重新加载参数
-        if result == ParameterWindow.DialogCode.Accepted:
-            self.load_parameters()
-            QMessageBox.information(self, "参数已更新", "参数设置已更新，下次计算将使用新的参数值。")
-            
-            # 如果已经匹配并计算过，则重新计算以应用新参数
-            if self.matched:
-                self.calculate_draggable_table_widget()
+        # 参数保存后会通过 on_parameters_changed 重新加载并重新计算
+        if result == ParameterWindow.DialogCode.Accepted and self.matched:
+            self.status_bar.showMessage("参数设置已更新，匹配表已按新参数重新计算")
+
+    def showEvent(self, event):
+        """窗口重新显示时（例如导入数据后）恢复参数订阅，并应用隐藏期间保存的参数"""
+        super().showEvent(event)
+        store = ParameterStore()
+        store.subscribe(self.on_parameters_changed)
+        params = store.get()
+        if params != self.params:
+            self.on_parameters_changed(params)
+
+    def closeEvent(self, event):
+        """窗口关闭后不再接收参数变化通知"""
+        ParameterStore().unsubscribe(self.on_parameters_changed)
+        super().closeEvent(event)
 
     def load_parameters(self):
         """加载参数设置"""
-        config_dir = os.path.join(os.path.expanduser("~"), ".tl_tools")
-        config_file = os.path.join(config_dir, "parameters.json")
-        
-        # 默认参数值
-        self.params = {
-            "h_a": 0.6,
-            "h_b": 0.6,
-            "k": 0.14,
-            "pc": -0.28,
-            "mc": -2.43,
-            "r": 6371000,
-            "tolerance_factor": 40
-        }
-        
-        # 如果配置文件存在，加载配置
-        if os.path.exists(config_file):
-            try:
-                with open(config_file, 'r') as f:
-                    loaded_params = json.load(f)
-                    
-                # 更新参数
-                for key, value in loaded_params.items():
-                    if key in self.params:
-                        self.params[key] = value
-            except Exception as e:
-                print(f"加载参数设置失败: {str(e)}")
+        self.params = ParameterStore().get()
 
+    def on_parameters_changed(self, params):
+        """参数保存后更新参数，已经匹配并计算过时重新计算以应用新参数"""
+        tolerance_changed = params.get("tolerance_factor") != self.params.get("tolerance_factor")
+        self.params = params
+        if self.matched:
+            changed = self.data_service.calculate_results(self.grouped_data)
+            self.table_widget.refresh_results(changed)
+            # 限差系数改变时重新计算全部对，否则只重新计算依赖于结果变化的观测的对
+            rows = None if tolerance_changed else self.table_widget.pair_calculator.rows_depending_on(changed)
+            self.calculate_draggable_table_widget(rows=rows)
 
 
 if __name__ == '__main__':
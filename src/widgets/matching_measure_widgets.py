@@ -1,8 +1,6 @@
-import openpyxl
 from PyQt6.QtWidgets import QMainWindow, QMessageBox, QFileDialog
-from openpyxl import Workbook
-from openpyxl.reader.excel import load_workbook
 
+from src.function.logger import log_error
 from src.widgets.menu_component import MenuComponent
 
 
@@ -29,37 +27,16 @@ class MatchingMeasureWidget(QMainWindow):
 
 
     def exportData(self):
+        # 由主窗口从数据层按当前行顺序取数值导出，不读取表格单元格
         try:
-            data = self.main_window.drag_table_widget.all_table_data
-            wb = Workbook()
-            ws = wb.active
-            ws.append(
-                ["文件名", "测站", "目标", "归零方向均值", "天顶角均值", "斜距" ,"仪器高(m)", "目标高(m)", "测站温度", "目标温度", "测站气压", "目标气压"])
-            # 写入数据
-            for row in data:
-                # 处理 None 值，避免写入到 Excel
-                clean_row = [cell if cell is not None else '' for cell in row]
-                ws.append(clean_row)
-            # 表格格式
-            for row in ws.iter_rows(min_row=1):
-                for cell in row:
-                    cell.alignment = openpyxl.styles.Alignment(horizontal='center', vertical='center')
-            # 宽度
-            ws.column_dimensions['A'].width = 20
-            ws.column_dimensions['B'].width = 10
-            ws.column_dimensions['C'].width = 10
-            ws.column_dimensions['D'].width = 16
-            ws.column_dimensions['E'].width = 20
-            ws.column_dimensions['F'].width = 10
-            ws.column_dimensions['G'].width = 10
-            ws.column_dimensions['H'].width = 10
-            ws.column_dimensions['I'].width = 10
-
-            # 保存为 Excel 文件
-            wb.save('output.xlsx')
-            QMessageBox.warning(self, '完成', '数据已保存到 Excel 文件')
+            data = self.main_window.get_all_table_data()
+            file_path = QFileDialog.getSaveFileName(self, '选择文件夹和输入文件名', '', 'Excel Files (*.xlsx)')[0]
+            if file_path:
+                self.main_window.data_service.export_excel(data, file_path, calculated=self.main_window.calculated)
+                QMessageBox.warning(self, '完成', f'文件已保存到: {file_path}')
         except Exception as e:
-            QMessageBox.warning(self, '错误', e)
+            log_error(e, "导出匹配表失败")
+            QMessageBox.warning(self, '错误', f"导出匹配表失败: {str(e)}")
 
     def importData(self):
         print('导入外业手簿')
@@ -74,6 +51,8 @@ class MatchingMeasureWidget(QMainWindow):
 
 
     def get_excel_data(self,file_path):
+        from openpyxl.reader.excel import load_workbook  # 首次使用时再加载 openpyxl，加快程序启动
+
         # Load the Excel workbook
         wb = load_workbook(file_path)
         ws = wb.active  # Get the active worksheet
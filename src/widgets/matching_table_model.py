@@ -0,0 +1,200 @@
+"""
+匹配表格的数据模型
+
+每一行对应一个分组键。行顺序和每行当前选中的观测由 PairCalculator 保存，
+单元格文本在视图请求时由观测数据生成，不再为每个单元格创建 QTableWidgetItem。
+拖动行通过 moveRows 完成，往返结果随行一起移动，视图只重绘受影响的行。
+"""
+import numpy as np
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PyQt6.QtGui import QBrush, QColor
+
+from src.data.observation_store import RESULT_COLUMNS
+from src.function.pair_calculator import PairCalculator
+from src.widgets.observation_table_model import raw_columns, raw_text
+
+LOOP_WARNING_COLOR = QColor(255, 205, 210)  # 闭合差超限的环经过的行
+
+# 计算结果显示的小数位数；数据层保存完整精度，只在显示时舍入
+DISPLAY_DECIMALS = 5
+# 导航按钮列的数据角色：(当前选中的观测序号 k, 观测数 n)，只有一条观测的分组为 None
+CANDIDATE_ROLE = Qt.ItemDataRole.UserRole + 1
+
+
+def format_number(value):
+    """计算结果的显示文本：保留 DISPLAY_DECIMALS 位小数，缺失值（None、NaN）显示为 None"""
+    if value is None or value != value:
+        return 'None'
+    return str(round(value, DISPLAY_DECIMALS))
+
+
+class MatchingTableModel(QAbstractTableModel):
+    """
+    匹配表格的数据模型
+
+    第 0 列和最后一列为导航按钮列（按钮由视图的委托绘制，模型通过 CANDIDATE_ROLE 提供第 k 条 / 共 n 条）；
+    之间依次为原始数据、计算结果（气象改正、加乘常数改正、平距、高差）和往返结果（高差中数、往返不符值、限差），
+    往返结果显示在每对的往测行。
+    """
+
+    def __init__(self, grouped_data, headers, current_indices=None, parent=None):
+        """
+        参数：
+            grouped_data (GroupedObservations): 已写入计算结果的分组数据，键的顺序即初始的行顺序
+            headers (list): 表头
+            current_indices (dict): 分组键 -> 当前选中的观测序号，缺省时取每组第一条
+        """
+        super().__init__(parent)
+        self.grouped_data = grouped_data
+        self.headers = list(headers)
+        self.current_indices = {key: 0 for key in grouped_data}
+        if current_indices:
+            self.current_indices.update(current_indices)
+        keys = list(grouped_data.keys())
+        groups = grouped_data.groups
+        self.pair_calculator = PairCalculator(grouped_data.store, keys,
+                                              [groups[key][self.current_indices[key]] for key in keys],
+                                              grouped_data.pair_index())
+        self.pair_results = [None] * len(keys)  # 每一行显示的往返计算结果（高差中数、往返不符值、限差）
+        self.flagged_keys = set()  # 闭合差超限的环经过的分组键
+        self._columns = raw_columns(grouped_data.store)
+        self.first_result_column = grouped_data.store.width + 1  # 计算结果紧接在原始数据之后
+        self.first_pair_column = len(self.headers) - 4
+
+    @property
+    def keys(self):
+        """每一行对应的分组键，顺序即当前的行顺序"""
+        return self.pair_calculator.keys
+
+    def refresh_columns(self):
+        """观测数据的列数组被更换后（detach 复制到内存）重新取列，不再引用原来的数组"""
+        self._columns = raw_columns(self.grouped_data.store)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.pair_calculator)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def cell_text(self, row, col):
+        """单元格的显示文本，导航按钮列和没有数据的单元格为 None"""
+        if col <= 0 or col >= len(self.headers) - 1:
+            return None
+        if col >= self.first_pair_column:
+            values = self.pair_results[row]
+            return None if values is None else format_number(values[col - self.first_pair_column])
+        observation = self.pair_calculator.observations[row]
+        store = self.grouped_data.store
+        offset = col - self.first_result_column
+        if 0 <= offset < len(RESULT_COLUMNS):
+            if store.results is None:
+                return None
+            return format_number(float(store.results[RESULT_COLUMNS[offset]][observation]))
+        return raw_text(store, self._columns, observation, col - 1)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.cell_text(index.row(), index.column())
+        if role == Qt.ItemDataRole.BackgroundRole and self.keys[index.row()] in self.flagged_keys:
+            return QBrush(LOOP_WARNING_COLOR)
+        if role == CANDIDATE_ROLE and self.is_navigation_column(index.column()):
+            return self.candidate_position(index.row())
+        return None
+
+    def is_navigation_column(self, col):
+        """是否为导航按钮列（第 0 列和最后一列）"""
+        return col == 0 or col == len(self.headers) - 1
+
+    def candidate_position(self, row):
+        """返回该行 (当前选中的观测序号 k, 观测数 n)，k 从 1 开始；分组只有一条观测时为 None"""
+        key = self.keys[row]
+        count = len(self.grouped_data.groups[key])
+        return (self.current_indices[key] + 1, count) if count > 1 else None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
+
+    def flags(self, index):
+        return Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+
+    def moveRows(self, source_parent, source_row, count, destination_parent, destination_child):
+        """
+        将一行移动到 destination_child 之前（Qt 的 moveRows 约定），每次只支持移动一行
+        配对与行顺序无关，往返结果随行一起移动，不需要重新计算
+        """
+        if count != 1 or source_parent.isValid() or destination_parent.isValid():
+            return False
+        to_row = destination_child - 1 if destination_child > source_row else destination_child
+        if not (0 <= source_row < len(self.pair_calculator) and 0 <= to_row < len(self.pair_calculator)):
+            return False
+        if not self.beginMoveRows(QModelIndex(), source_row, source_row, QModelIndex(), destination_child):
+            return False
+        self.pair_calculator.move_row(source_row, to_row)
+        self.pair_results.insert(to_row, self.pair_results.pop(source_row))
+        self.endMoveRows()
+        return True
+
+    def set_current_index(self, row, index):
+        """
+        切换某一行选中的观测
+        参数：
+            row (int): 行号
+            index (int): 观测在分组中的序号
+        返回：
+            list: 观测有变化的行，用于重新计算往返结果
+        """
+        key = self.keys[row]
+        self.current_indices[key] = index
+        rows = self.pair_calculator.set_observation(row, self.grouped_data.groups[key][index])
+        self._rows_changed(rows, 0, len(self.headers) - 1)  # 包括导航按钮列中的观测序号
+        return rows
+
+    def refresh_results(self, changed=None):
+        """
+        计算结果更新后通知视图刷新计算结果列
+        参数：
+            changed (dict): 结果列名 -> 按观测行号标记数值是否变化的布尔数组，缺省时刷新全部行
+        """
+        if changed is None:
+            rows = range(len(self.pair_calculator))
+        else:
+            observations = self.pair_calculator.observations
+            rows = np.flatnonzero(np.logical_or.reduce([changed[name][observations] for name in RESULT_COLUMNS]))
+            rows = rows.tolist()
+        self._rows_changed(rows, self.first_result_column, self.first_result_column + len(RESULT_COLUMNS) - 1)
+
+    def set_pair_results(self, results, rows=None):
+        """
+        设置高差中数、往返不符值和限差，只通知数值有变化的行
+        参数：
+            results (list): 每行的三个计算结果（元组），为 None 时清空该行的结果
+            rows (list): results 对应的行号，缺省时为全部行
+        """
+        rows = range(len(results)) if rows is None else rows
+        pair_results = self.pair_results
+        changed = []
+        for row, values in zip(rows, results):
+            if pair_results[row] != values:
+                pair_results[row] = values
+                changed.append(row)
+        self._rows_changed(changed, self.first_pair_column, self.first_pair_column + 2)
+
+    def set_flagged_keys(self, keys):
+        """标记闭合差超限的环经过的行，清除之前的标记"""
+        previous, self.flagged_keys = self.flagged_keys, set(keys)
+        rows = [row for row, key in enumerate(self.keys) if key in previous or key in self.flagged_keys]
+        self._rows_changed(rows, 0, len(self.headers) - 1, [Qt.ItemDataRole.BackgroundRole])
+
+    def _rows_changed(self, rows, first_col, last_col, roles=None):
+        """通知视图指定行、列范围内的单元格有变化；视图只重绘其中可见的部分"""
+        rows = list(rows)
+        if not rows:
+            return
+        roles = roles or [Qt.ItemDataRole.DisplayRole]
+        self.dataChanged.emit(self.index(min(rows), first_col), self.index(max(rows), last_col), roles)
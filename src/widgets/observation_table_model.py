@@ -0,0 +1,93 @@
+"""
+导入数据表格的数据模型
+
+表格直接读取 ObservationStore 的列数据，QTableView 只请求可见单元格的文本，
+不再为每个单元格创建 QTableWidgetItem，导入大量观测时加载时间和内存占用与行数基本无关。
+"""
+import numpy as np
+from PyQt6.QtCore import QAbstractTableModel, QModelIndex, Qt
+
+from src.data.observation_store import NUMERIC_COLUMNS
+
+
+def raw_columns(store):
+    """返回原始数据每一列的取值数组：前三列为文件名、测站、目标的编码，其余为数值列"""
+    columns = [store.file_codes, store.station_codes, store.target_codes]
+    columns.extend(store.columns[name] for name in NUMERIC_COLUMNS[:store.width - 3])
+    return columns
+
+
+def raw_text(store, columns, observation, col):
+    """
+    原始数据单元格的显示文本，与 str(store.row(observation)[col]) 一致
+    参数：
+        store (ObservationStore): 观测数据
+        columns (list): raw_columns(store) 的返回值
+        observation (int): 观测行号
+        col (int): 原始数据的列号，超出原始数据列数时返回 None
+    """
+    if col >= len(columns):
+        return None
+    value = columns[col][observation]
+    if col < 3:
+        return str(store.labels[value])
+    return 'None' if np.isnan(value) else str(float(value))
+
+
+class ObservationTableModel(QAbstractTableModel):
+    def __init__(self, headers, store=None, parent=None):
+        """
+        参数：
+            headers (list): 表头
+            store (ObservationStore): 观测数据，为 None 时表格为空
+        """
+        super().__init__(parent)
+        self.headers = list(headers)
+        self.store = None
+        self._columns = []  # 每一列的取值数组：前三列为名称编码，其余为数值列
+        self.set_store(store)
+
+    def set_store(self, store):
+        """更换显示的观测数据，视图整体刷新"""
+        self.beginResetModel()
+        self.store = store
+        self.refresh_columns()
+        self.endResetModel()
+
+    def refresh_columns(self):
+        """观测数据的列数组被更换后（追加、detach 复制到内存）重新取列，数据不变时视图无需刷新"""
+        self._columns = raw_columns(self.store) if self.store is not None else []
+
+    def append_store(self, chunk):
+        """
+        在当前观测数据末尾追加一批观测（边解析边显示），视图只插入新增的行
+        参数：
+            chunk (ObservationStore): 新解析的观测数据
+        """
+        if self.store is None or not len(chunk):
+            return
+        first = len(self.store)
+        self.beginInsertRows(QModelIndex(), first, first + len(chunk) - 1)
+        self.store.append(chunk)
+        self.refresh_columns()  # 追加后列数组已更换
+        self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid() or self.store is None:
+            return 0
+        return len(self.store)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole or not index.isValid():
+            return None
+        return raw_text(self.store, self._columns, index.row(), index.column())
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if orientation == Qt.Orientation.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
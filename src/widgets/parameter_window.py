@@ -1,5 +1,3 @@
-import os
-import json
 from PyQt6.QtWidgets import (
     QDialog,
     QVBoxLayout,
@@ -13,6 +11,7 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QDoubleValidator
+from src.function.parameter_store import ParameterStore, DEFAULT_PARAMETERS
 
 class ParameterWindow(QDialog):
     def __init__(self, parent=None):
@@ -21,15 +20,7 @@ class ParameterWindow(QDialog):
         self.resize(400, 350)
         
         # 默认参数值
-        self.default_params = {
-            "h_a": 0.6,
-            "h_b": 0.6,
-            "k": 0.14,
-            "pc": -0.28,
-            "mc": -2.43,
-            "r": 6371000,
-            "tolerance_factor": 40  # 添加tolerance系数默认值
-        }
+        self.default_params = DEFAULT_PARAMETERS.copy()
         
         # 加载已保存的参数
         self.params = self.load_parameters()
@@ -99,7 +90,7 @@ class ParameterWindow(QDialog):
         main_layout.addWidget(params_group)
         
         # 添加说明标签
-        description = QLabel("这些参数用于三角高程测量计算。\n修改后点击保存，重启程序后生效。")
+        description = QLabel("这些参数用于三角高程测量计算。\n修改后点击保存，已匹配的数据会立即按新参数重新计算。")
         description.setAlignment(Qt.AlignmentFlag.AlignCenter)
         main_layout.addWidget(description)
         
@@ -142,26 +133,10 @@ class ParameterWindow(QDialog):
         
     def load_parameters(self):
         """加载参数配置"""
-        config_dir = os.path.join(os.path.expanduser("~"), ".tl_tools")
-        config_file = os.path.join(config_dir, "parameters.json")
-        
-        # 如果配置文件不存在，使用默认值
-        if not os.path.exists(config_file):
-            return self.default_params.copy()
-        
-        try:
-            with open(config_file, 'r') as f:
-                params = json.load(f)
-                
-            # 确保所有必要的参数都存在
-            for key in self.default_params:
-                if key not in params:
-                    params[key] = self.default_params[key]
-                    
-            return params
-        except Exception as e:
-            QMessageBox.warning(self, "加载失败", f"无法加载参数设置: {str(e)}\n将使用默认参数。")
-            return self.default_params.copy()
+        params = ParameterStore().get()
+        if ParameterStore().load_error:
+            QMessageBox.warning(self, "加载失败", f"无法加载参数设置: {str(ParameterStore().load_error)}\n将使用默认参数。")
+        return params
         
     def save_parameters(self):
         """保存参数配置"""
@@ -177,16 +152,10 @@ class ParameterWindow(QDialog):
                 "tolerance_factor": float(self.tolerance_factor_edit.text())  # 保存tolerance系数值
             }
             
-            # 创建配置目录
-            config_dir = os.path.join(os.path.expanduser("~"), ".tl_tools")
-            os.makedirs(config_dir, exist_ok=True)
-            
-            # 保存到配置文件
-            config_file = os.path.join(config_dir, "parameters.json")
-            with open(config_file, 'w') as f:
-                json.dump(params, f, indent=4)
+            # 保存到配置文件，并通知使用参数的窗口
+            ParameterStore().save(params)
                 
-            QMessageBox.information(self, "保存成功", "参数设置已保存，重启程序后生效。")
+            QMessageBox.information(self, "保存成功", "参数设置已保存，已匹配的数据将按新参数重新计算。")
             self.accept()
         except Exception as e:
             QMessageBox.critical(self, "保存失败", f"无法保存参数设置: {str(e)}") 
\ No newline at end of file
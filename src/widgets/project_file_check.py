@@ -0,0 +1,116 @@
+"""
+覆盖保存当前打开的项目时释放项目文件的检查
+
+用法：
+    python -m src.widgets.project_file_check [-n 观测数]
+
+生成模拟数据并保存为项目文件，打开该项目并重新计算（天顶角解码缓存会引用内存映射的列），
+用导入数据表格和匹配表格的数据模型显示，再按 MainWindow.saveProject 的步骤覆盖保存到同一文件。检查保存后不再有数组映射着原项目文件
+（Windows 上仍被映射的文件不能被 os.replace 覆盖，也不能删除），然后用另一份保存替换并删除项目文件，
+重新打开替换后的文件，检查数据和表格显示的文本与保存前一致。
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import weakref
+
+import numpy as np
+
+from src.data.data_service import DataService
+from src.data.observation_store import ObservationStore
+from src.data.project_file import load_project, save_project
+from src.function.parallel_benchmark import synthetic_rows
+from src.function.parameter_store import DEFAULT_PARAMETERS
+from src.widgets.matching_table_model import MatchingTableModel
+from src.widgets.observation_table_model import ObservationTableModel
+from src.widgets.recompute_benchmark import HEADERS
+
+
+def mapped_arrays(store):
+    """返回观测数据中内存映射项目文件的数组（含天顶角解码缓存中的列）"""
+    arrays = [store.file_codes, store.station_codes, store.target_codes, *store.columns.values()]
+    if store.results is not None:
+        arrays.extend(store.results.values())
+    if store._zenith_radians is not None:
+        arrays.append(store._zenith_radians[0])
+    return list({id(array): array for array in arrays if isinstance(array, np.memmap)}.values())
+
+
+def table_texts(model):
+    """返回数据模型全部单元格的显示文本"""
+    return [[model.cell_text(row, col) if hasattr(model, "cell_text") else model.data(model.index(row, col))
+             for col in range(model.columnCount())] for row in range(model.rowCount())]
+
+
+def save_open_project(file_path, project, models):
+    """按 MainWindow.saveProject 的步骤覆盖保存打开的项目：复制到内存、表格模型重新取列后再保存"""
+    project["store"].detach()
+    for model in models:
+        model.refresh_columns()
+    save_project(file_path, project["store"], project["grouped_data"],
+                 row_keys=project["row_keys"], current_indices=project["current_indices"])
+
+
+def run_check(observations):
+    """
+    返回检查失败的说明列表，全部通过时为空列表
+    """
+    data_service = DataService()
+    params = DEFAULT_PARAMETERS.copy()
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, "project.tlp")
+        store = ObservationStore.from_rows(synthetic_rows(observations))
+        grouped_data = data_service.sort_and_calculate(data_service.group_data(store))
+        data_service.calculate_results(grouped_data, params)
+        save_project(file_path, store, grouped_data)
+
+        project = load_project(file_path)
+        data_service.calculate_results(project["grouped_data"], params)
+        models = [ObservationTableModel(HEADERS[1:13], project["store"]),
+                  MatchingTableModel(project["grouped_data"].reorder(project["row_keys"]), HEADERS,
+                                     project["current_indices"])]
+        texts = [table_texts(model) for model in models]
+        mapped = [weakref.ref(array) for array in mapped_arrays(project["store"])]
+        if not mapped:
+            failures.append("打开的项目没有使用内存映射")
+        save_open_project(file_path, project, models)
+        gc.collect()
+        alive = sum(ref() is not None for ref in mapped)
+        if alive:
+            failures.append(f"覆盖保存后仍有 {alive} 个数组映射着项目文件")
+        if [table_texts(model) for model in models] != texts:
+            failures.append("覆盖保存后表格显示的文本发生变化")
+
+        # 用另一份保存替换项目文件，再删除替换后的文件
+        expected = project["store"].rows(range(len(project["store"])))
+        replacement = os.path.join(directory, "replacement.tlp")
+        save_open_project(replacement, project, models)
+        os.replace(replacement, file_path)
+        reopened = load_project(file_path)
+        if reopened["store"].rows(range(len(reopened["store"]))) != expected:
+            failures.append("替换后重新打开的数据与保存前不一致")
+        if reopened["row_keys"] != project["row_keys"] or reopened["current_indices"] != project["current_indices"]:
+            failures.append("替换后重新打开的行顺序或当前选中的观测与保存前不一致")
+        del reopened
+        gc.collect()
+        os.remove(file_path)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="覆盖保存当前打开的项目时释放项目文件的检查")
+    parser.add_argument("-n", "--observations", type=int, default=20000, help="模拟数据的观测数")
+    args = parser.parse_args(argv)
+
+    failures = run_check(args.observations)
+    print(f"观测数: {args.observations}，{'全部通过' if not failures else '检查失败'}")
+    for failure in failures:
+        print(f"    {failure}")
+    return 0 if not failures else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
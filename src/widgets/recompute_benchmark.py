@@ -0,0 +1,99 @@
+"""
+参数修改后原位重新计算的耗时测试
+
+用法：
+    python -m src.widgets.recompute_benchmark [外业手簿匹配表.xlsx] [-n 观测数] [--budget 秒]
+
+不指定匹配表时生成模拟的测站网观测数据。建立匹配表格的数据模型后，依次修改大气折光系数、
+加常数、乘常数、地球半径和限差系数，按 MainWindow.on_parameters_changed 的步骤重新计算
+（测量计算、通知模型刷新计算结果列、重新计算受影响的往返结果并写入模型），输出每次的耗时，
+并检查结果与用新参数全部重新计算一致。不包括视图重绘，重绘只涉及可见的行。
+不读写参数设置文件。
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from src.data.data_service import DataService
+from src.data.observation_store import ObservationStore, RESULT_COLUMNS
+from src.function.measurement import Measurement
+from src.function.parallel_benchmark import synthetic_rows
+from src.function.parameter_store import DEFAULT_PARAMETERS
+from src.widgets.matching_table_model import MatchingTableModel
+
+# 匹配表格的表头，与 DraggableTableWidget 一致
+HEADERS = ["上一个", "文件名", "测站", "目标", "归零方向均值", "天顶角均值", "斜距(m)", "仪器高(m)", "目标高(m)",
+           "测站温度(℃)", "目标温度(℃)", "测站气压(hPa)", "目标气压(hPa)", "气象改正(m)", "加乘常数改正(m)", "平距(m)",
+           "高差(m)", "高差中数(m)", "往返不符值(mm)", "限差(mm)", "下一个"]
+# 依次修改的参数
+PARAMETER_CHANGES = (("k", 0.13), ("k", 0.15), ("pc", -0.3), ("mc", -2.0), ("r", 6378137), ("tolerance_factor", 30))
+
+
+def recompute(data_service, grouped_data, model, params, tolerance_changed):
+    """按 MainWindow.on_parameters_changed 的步骤重新计算，并写入匹配表格的数据模型"""
+    changed = data_service.calculate_results(grouped_data, params)
+    model.refresh_results(changed)
+    rows = None if tolerance_changed else model.pair_calculator.rows_depending_on(changed)
+    pair_rows, pair_results = model.pair_calculator.calculate(rows, params["tolerance_factor"])
+    model.set_pair_results(pair_results, pair_rows)
+
+
+def check(grouped_data, model, params):
+    """用新参数全部重新计算，检查存储的计算结果和模型中的往返结果是否一致"""
+    store = grouped_data.store
+    indices = grouped_data.indices()
+    columns = {name: store.column(name)[indices] for name in ("s", "z", "i", "l", "t_a", "t_b", "p_a", "p_b")}
+    expected = Measurement.calculate_all_batch(**columns, **{name: params[name] for name in ("h_a", "h_b", "k", "pc",
+                                                                                             "mc", "r")})
+    same = all(np.array_equal(store.results[name][indices], expected[name], equal_nan=True) for name in RESULT_COLUMNS)
+    pair_rows, pair_results = model.pair_calculator.calculate(None, params["tolerance_factor"])
+    return same and all(model.pair_results[row] == values for row, values in zip(pair_rows, pair_results))
+
+
+def run_benchmark(store):
+    """
+    返回 [(修改的参数, 新值, 耗时(s), 结果是否一致), ...]
+    """
+    data_service = DataService()
+    params = DEFAULT_PARAMETERS.copy()
+    grouped_data = data_service.sort_and_calculate(data_service.group_data(store))
+    data_service.calculate_results(grouped_data, params)
+    model = MatchingTableModel(grouped_data, HEADERS)
+    pair_rows, pair_results = model.pair_calculator.calculate(None, params["tolerance_factor"])
+    model.set_pair_results(pair_results, pair_rows)
+
+    timings = []
+    for name, value in PARAMETER_CHANGES:
+        params = dict(params, **{name: value})
+        start = time.perf_counter()
+        recompute(data_service, grouped_data, model, params, name == "tolerance_factor")
+        elapsed = time.perf_counter() - start
+        timings.append((name, value, elapsed, check(grouped_data, model, params)))
+    return timings
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="参数修改后原位重新计算的耗时测试")
+    parser.add_argument("input", nargs="?", help="外业手簿匹配表(.xlsx)，不指定时使用模拟数据")
+    parser.add_argument("-n", "--observations", type=int, default=20000, help="模拟数据的观测数")
+    parser.add_argument("--budget", type=float, default=0.2, help="每次重新计算允许的最长耗时(s)")
+    args = parser.parse_args(argv)
+
+    if args.input:
+        store = DataService().import_excel(args.input)
+    else:
+        store = ObservationStore.from_rows(synthetic_rows(args.observations))
+    print(f"观测数: {len(store)}，耗时上限: {args.budget:.3f} s")
+    print("参数                     耗时(s)    结果一致")
+    timings = run_benchmark(store)
+    for name, value, elapsed, same in timings:
+        print(f"{name + ' = ' + str(value):<22} {elapsed:>9.3f}    {'是' if same else '否'}")
+    slowest = max(elapsed for _, _, elapsed, _ in timings)
+    print(f"最长 {slowest:.3f} s，{'满足' if slowest <= args.budget else '超出'}耗时上限")
+    return 0 if slowest <= args.budget and all(same for _, _, _, same in timings) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,9 +7,7 @@ from PyQt6.QtWidgets import (QApplication, QWidget, QVBoxLayout, QHBoxLayout,
 from PyQt6.QtCore import Qt, QUrl, pyqtSignal
 from PyQt6.QtGui import QFont, QPalette, QColor
 from src.ui.arrowcombobox import ArrowComboBox
-from PyQt6.QtWebEngineWidgets import QWebEngineView
 import os
-import pandas as pd
 
 class PointProcessorUI(QWidget):
     """数据处理程序的用户界面"""
@@ -17,6 +15,7 @@ class PointProcessorUI(QWidget):
     
     def __init__(self):
         super().__init__()
+        self._webviews = {}  # 按需创建的 QWebEngineView
         self.init_ui()
         self.setup_styles()
         
@@ -246,12 +245,10 @@ class PointProcessorUI(QWidget):
         # ========== 对比图Tab ===========
         self.scatter_tab_content = QLabel("请先进行质量检查")
         self.scatter_tab_content.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.scatter_webview = QWebEngineView()
         self.main_tab.addTab(self.scatter_tab_content, "对比图")
         # ========== 柱状图Tab ===========
         self.bar_tab_content = QLabel("请先进行质量检查")
         self.bar_tab_content.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.bar_webview = QWebEngineView()
         # 柱状图统计信息Label
         self.bar_info_label = QLabel("")
         self.bar_info_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -260,7 +257,6 @@ class PointProcessorUI(QWidget):
         # ========== 质检结果Tab ===========
         self.result_tab_content = QLabel("请先进行质量检查")
         self.result_tab_content.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        self.result_webview = QWebEngineView()
         self.main_tab.addTab(self.result_tab_content, "质检结果")
         # ========== 历史记录Tab ===========
         self.history_tab_content = QLabel("暂无历史记录")
@@ -382,6 +378,28 @@ class PointProcessorUI(QWidget):
         )
         return file_name if file_name else None
 
+    def _get_webview(self, name):
+        """
+        首次使用时才创建 QWebEngineView，避免启动时加载 QtWebEngine
+        （延迟加载要求创建 QApplication 前设置 AA_ShareOpenGLContexts）
+        """
+        if name not in self._webviews:
+            from PyQt6.QtWebEngineWidgets import QWebEngineView
+            self._webviews[name] = QWebEngineView()
+        return self._webviews[name]
+
+    @property
+    def scatter_webview(self):
+        return self._get_webview("scatter")
+
+    @property
+    def bar_webview(self):
+        return self._get_webview("bar")
+
+    @property
+    def result_webview(self):
+        return self._get_webview("result")
+
     def _update_radius(self):
         """根据比例尺更新搜索半径"""
         scale_text = self.scale_combo.currentText()
@@ -427,6 +445,8 @@ class PointProcessorUI(QWidget):
         """
         支持传入DataFrame或Excel文件路径，自动显示到质检结果Tab。
         """
+        import pandas as pd
+
         try:
             if isinstance(data, pd.DataFrame):
                 df = data.fillna("")